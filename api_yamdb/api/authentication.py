@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from reviews.models import User
+
+TOKEN_VERSION_CLAIM = 'token_version'
+USER_CLAIMS = ('username', 'role', 'is_superuser', TOKEN_VERSION_CLAIM)
+
+
+def add_user_claims(token, user):
+    """
+    Добавляет в токен данные пользователя, которых достаточно для проверки
+    прав доступа без запроса к БД
+    """
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_superuser'] = user.is_superuser
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+
+def token_version_cache_key(user_id):
+    return f'token_version:{user_id}'
+
+
+def get_token_version(user_id):
+    """
+    Актуальная версия токенов пользователя или None, если пользователь
+    удалён или заблокирован. При настроенном общем кеше проверка
+    обходится без запроса к БД
+    """
+    cache = None
+    if settings.TOKEN_VERSION_CACHE_ALIAS:
+        cache = caches[settings.TOKEN_VERSION_CACHE_ALIAS]
+        version = cache.get(token_version_cache_key(user_id))
+        if version is not None:
+            return version
+    version = (User.objects.filter(pk=user_id, is_active=True)
+               .values_list(TOKEN_VERSION_CLAIM, flat=True)
+               .first())
+    if cache is not None and version is not None:
+        cache.set(token_version_cache_key(user_id), version,
+                  settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def forget_token_version(user_id):
+    if settings.TOKEN_VERSION_CACHE_ALIAS:
+        caches[settings.TOKEN_VERSION_CACHE_ALIAS].delete(
+            token_version_cache_key(user_id)
+        )
+
+
+class ClaimsUser(TokenUser):
+    """
+    Лёгкий пользователь, построенный по данным из токена. Предоставляет то,
+    что нужно классам разрешений: id, username, role и is_superuser
+    """
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @property
+    def is_admin(self):
+        return self.role == User.ADMINISTRATOR
+
+    @property
+    def is_moderator(self):
+        return self.role == User.MODERATOR
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без загрузки пользователя из БД: request.user
+    строится по данным токена. Вместо строки пользователя проверяется
+    только версия его токенов, которая увеличивается при смене роли,
+    прав или блокировке, поэтому такие изменения действуют сразу.
+    Токены без нужных данных обрабатываются как раньше, с загрузкой
+    пользователя
+    """
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        version = get_token_version(user_id)
+        if version is None:
+            raise AuthenticationFailed('Пользователь не найден',
+                                       code='user_not_found')
+        if version != validated_token[TOKEN_VERSION_CLAIM]:
+            raise AuthenticationFailed('Токен отозван',
+                                       code='token_revoked')
+        return ClaimsUser(validated_token)
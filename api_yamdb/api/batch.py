@@ -0,0 +1,218 @@
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+
+from api.metrics import RequestMetrics, current_request_metrics
+from api.serializers import BatchItemSerializer
+
+logger = logging.getLogger('api.batch')
+
+# Методы, которые не меняют данные: идущие подряд такие запросы пакета
+# независимы и выполняются параллельно
+PARALLEL_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+# Метаданные запроса пакета, которые нужны вложенным запросам для
+# абсолютных ссылок (пагинация) и журналов
+FORWARDED_META = ('SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_HOST',
+                  'HTTP_X_FORWARDED_HOST', 'HTTP_X_FORWARDED_PORT',
+                  'HTTP_X_FORWARDED_PROTO', 'HTTP_USER_AGENT')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BATCH_WORKERS,
+                thread_name_prefix='api-batch',
+            )
+    return _executor
+
+
+class SubRequest(HttpRequest):
+    """
+    Вложенный запрос пакета. Пользователь, прошедший аутентификацию
+    в запросе пакета, передаётся view как уже аутентифицированный
+    (механизм принудительной аутентификации DRF), поэтому токен
+    не проверяется повторно
+    """
+
+    def __init__(self, parent, method, path, body):
+        super().__init__()
+        url = urlsplit(path)
+        self.method = method
+        self.path = self.path_info = url.path
+        self.GET = QueryDict(url.query)
+        self.META = {key: parent.META[key] for key in FORWARDED_META
+                     if key in parent.META}
+        content = b'' if body is None else json.dumps(body).encode()
+        self.META.update({
+            'REQUEST_METHOD': method,
+            'QUERY_STRING': url.query,
+            'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+        })
+        self._stream = io.BytesIO(content)
+        self._read_started = False
+        self._scheme = parent.scheme
+        user = getattr(parent, 'user', None)
+        if user is not None and user.is_authenticated:
+            self._force_auth_user = user
+            self._force_auth_token = parent.auth
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def error_response(status, detail):
+    return HttpResponse(json.dumps({'detail': detail}, ensure_ascii=False),
+                        status=status, content_type='application/json')
+
+
+def dispatch(request):
+    """Ответ вложенного запроса; view вызывается через URL resolver"""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return error_response(404, 'Страница не найдена.')
+    request.resolver_match = match
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+        if getattr(response, 'streaming', False):
+            return error_response(
+                400, 'Потоковые ответы в пакете не поддерживаются'
+            )
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    except Exception:
+        if settings.DEBUG_PROPAGATE_EXCEPTIONS:
+            raise
+        logger.exception('Ошибка вложенного запроса %s %s', request.method,
+                         request.get_full_path())
+        return error_response(500, 'Ошибка сервера.')
+
+
+def dispatch_in_worker(request):
+    """
+    Выполняет вложенный запрос в потоке пула. Запросы к БД из потока
+    считаются в отдельные счётчики, которые потом прибавляются
+    к счётчикам запроса пакета
+    """
+    metrics = None
+    if current_request_metrics.get() is not None:
+        metrics = RequestMetrics()
+        current_request_metrics.set(metrics)
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            if metrics is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+            return dispatch(request), metrics
+    finally:
+        # Как в конце обычного запроса: соединения потока закрываются
+        # с учётом CONN_MAX_AGE
+        close_old_connections()
+
+
+def encode_response(response):
+    headers = {name: value for name, value in response.items()}
+    content = response.content
+    if not content:
+        body = b'null'
+    elif 'json' in response.get('Content-Type', ''):
+        body = content
+    else:
+        body = json.dumps(content.decode(response.charset),
+                          ensure_ascii=False).encode()
+    return b'{"status":%d,"headers":%s,"body":%s}' % (
+        response.status_code,
+        json.dumps(headers, ensure_ascii=False).encode(),
+        body,
+    )
+
+
+class BatchView(APIView):
+    """
+    Пакет запросов к API за один HTTP-запрос: список объектов
+    {"method", "path", "body"}, в ответе - список {"status", "headers",
+    "body"} в том же порядке. Запросы выполняются по порядку; идущие подряд
+    GET, HEAD и OPTIONS - параллельно в пуле из BATCH_WORKERS потоков.
+    Права проверяются для каждого вложенного запроса
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def check_limits(self, items):
+        cost = sum(settings.BATCH_METHOD_COSTS[item['method']]
+                   for item in items)
+        if cost > settings.BATCH_MAX_COST:
+            raise ValidationError(
+                f'Стоимость пакета {cost} больше допустимой '
+                f'{settings.BATCH_MAX_COST}'
+            )
+
+    def post(self, request):
+        # Размер проверяется до разбора вложенных запросов
+        if (isinstance(request.data, list)
+                and len(request.data) > settings.BATCH_MAX_REQUESTS):
+            raise ValidationError(
+                f'В пакете не больше {settings.BATCH_MAX_REQUESTS} запросов'
+            )
+        serializer = BatchItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+        self.check_limits(items)
+        # Пользователь аутентифицирован один раз для всего пакета
+        # (APIView.initial) и передаётся во вложенные запросы
+        subrequests = [SubRequest(request, item['method'], item['path'],
+                                  item['body'])
+                       for item in items]
+        responses = []
+        group = []
+        for subrequest in subrequests:
+            if subrequest.method in PARALLEL_METHODS:
+                group.append(subrequest)
+                continue
+            responses += self.run_parallel(group)
+            group = []
+            responses.append(dispatch(subrequest))
+        responses += self.run_parallel(group)
+        return HttpResponse(
+            b'[' + b','.join(map(encode_response, responses)) + b']',
+            content_type='application/json'
+        )
+
+    def run_parallel(self, subrequests):
+        if len(subrequests) < 2 or settings.BATCH_WORKERS < 2:
+            return [dispatch(subrequest) for subrequest in subrequests]
+        executor = get_executor()
+        # Контекст (метрики, журнал медленных запросов) копируется
+        # в поток для каждого вложенного запроса
+        futures = [executor.submit(copy_context().run, dispatch_in_worker,
+                                   subrequest)
+                   for subrequest in subrequests]
+        responses = []
+        parent_metrics = current_request_metrics.get()
+        for future in futures:
+            response, metrics = future.result()
+            if metrics is not None:
+                parent_metrics.add(metrics)
+            responses.append(response)
+        return responses
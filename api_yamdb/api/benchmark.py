@@ -0,0 +1,294 @@
+import math
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.authentication import add_user_claims
+from api.renderers import FastJSONRenderer
+from reviews.bitmaps import title_bitmap_index
+from reviews.generator import DataGenerator, Distribution
+from reviews.models import Genre, Review, Title, User
+from reviews.suggest import title_suggest_index
+
+ANONYMOUS = 'anonymous'
+USER = 'user'
+ADMIN = 'admin'
+
+# Эндпоинты с крупными ответами, на которых сравниваются JSON-рендереры
+RENDERED_ENDPOINTS = ('titles-list', 'reviews-list')
+RENDERERS = (('json', JSONRenderer), ('fast', FastJSONRenderer))
+
+# Метрики, которые сравниваются с базовой линией
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb')
+
+Endpoint = namedtuple('Endpoint', 'name method role path data',
+                      defaults=(None,))
+Comparison = namedtuple('Comparison',
+                        'scale endpoint metric baseline current change '
+                        'regression')
+
+
+def seed(scale, workers=1):
+    """
+    Заполняет БД синтетическими данными: около scale отзывов с популярностью
+    произведений и авторов по закону Ципфа, в среднем по комментарию
+    на отзыв, в десять раз меньше произведений
+    """
+    DataGenerator(
+        users=max(scale // 20, 10),
+        titles=max(scale // 10, 10),
+        # в среднем около 9 отзывов на произведение
+        reviews_per_title=Distribution('zipf:1:40'),
+        comments_per_review=Distribution('uniform:0:2'),
+        genres=10,
+        categories=5,
+        workers=workers,
+    ).run()
+
+
+def reset_process_state():
+    """Сбрасывает кеши и индексы в памяти, чтобы замеры не зависели
+    от предыдущих прогонов"""
+    for cache in caches.all():
+        cache.clear()
+    title_suggest_index.reset()
+    title_bitmap_index.reset()
+
+
+def jwt_client(user):
+    client = APIClient()
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    return client
+
+
+def benchmark_context():
+    """Объекты, на которые ссылаются замеряемые запросы"""
+    title = (Title.objects.annotate(reviews_count=Count('reviews'))
+             .order_by('-reviews_count', 'id').first())
+    review = (Review.objects.filter(title=title)
+              .annotate(comments_count=Count('comments'))
+              .order_by('-comments_count', 'id').first())
+    user, _ = User.objects.get_or_create(
+        username='benchmark', defaults={'email': 'benchmark@yamdb.fake'}
+    )
+    admin, _ = User.objects.get_or_create(
+        username='benchmark-admin',
+        defaults={'email': 'benchmark-admin@yamdb.fake',
+                  'role': User.ADMINISTRATOR}
+    )
+    return {
+        'title_id': title.id,
+        'title_prefix': title.name[:4],
+        'review_id': review.id,
+        'genres': ','.join(Genre.objects.order_by('id')
+                           .values_list('slug', flat=True)[:2]),
+        # Произведения без отзыва пользователя benchmark для POST-запросов
+        'free_title_ids': list(Title.objects.order_by('-id')
+                               .values_list('id', flat=True)[:500]),
+        'user': user,
+        'admin': admin,
+        'confirmation_code': default_token_generator.make_token(user),
+        'clients': {
+            ANONYMOUS: APIClient(),
+            USER: jwt_client(user),
+            ADMIN: jwt_client(admin),
+        },
+    }
+
+
+def free_title(context, iteration):
+    title_ids = context['free_title_ids']
+    return title_ids[iteration % len(title_ids)]
+
+
+ENDPOINTS = (
+    Endpoint('titles-list', 'get', ANONYMOUS,
+             lambda context, i: '/api/v1/titles/'),
+    Endpoint('titles-filtered', 'get', ANONYMOUS,
+             lambda context, i: (f'/api/v1/titles/?genre={context["genres"]}'
+                                 '&ordering=-rating')),
+    Endpoint('titles-search', 'get', ANONYMOUS,
+             lambda context, i: '/api/v1/titles/?q=описание'),
+    Endpoint('titles-detail', 'get', ANONYMOUS,
+             lambda context, i: f'/api/v1/titles/{context["title_id"]}/'),
+    Endpoint('titles-suggest', 'get', ANONYMOUS,
+             lambda context, i: ('/api/v1/titles/suggest/'
+                                 f'?prefix={context["title_prefix"]}')),
+    Endpoint('titles-facets', 'get', ANONYMOUS,
+             lambda context, i: '/api/v1/titles/facets/'),
+    Endpoint('reviews-list', 'get', ANONYMOUS,
+             lambda context, i: (f'/api/v1/titles/{context["title_id"]}'
+                                 '/reviews/')),
+    Endpoint('reviews-detail', 'get', ANONYMOUS,
+             lambda context, i: (f'/api/v1/titles/{context["title_id"]}'
+                                 f'/reviews/{context["review_id"]}/')),
+    Endpoint('comments-list', 'get', ANONYMOUS,
+             lambda context, i: (f'/api/v1/titles/{context["title_id"]}'
+                                 f'/reviews/{context["review_id"]}'
+                                 '/comments/')),
+    Endpoint('reviews-create', 'post', USER,
+             lambda context, i: (f'/api/v1/titles/{free_title(context, i)}'
+                                 '/reviews/'),
+             lambda context, i: {'text': f'Отзыв {i}', 'score': 7}),
+    Endpoint('categories-list', 'get', ANONYMOUS,
+             lambda context, i: '/api/v1/categories/'),
+    Endpoint('genres-list', 'get', ANONYMOUS,
+             lambda context, i: '/api/v1/genres/'),
+    Endpoint('users-me', 'get', USER,
+             lambda context, i: '/api/v1/users/me/'),
+    Endpoint('users-list', 'get', ADMIN,
+             lambda context, i: '/api/v1/users/'),
+    Endpoint('auth-token', 'post', ANONYMOUS,
+             lambda context, i: '/api/v1/auth/token/',
+             lambda context, i: {
+                 'username': context['user'].username,
+                 'confirmation_code': context['confirmation_code'],
+             }),
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def call(endpoint, context, iteration):
+    client = context['clients'][endpoint.role]
+    kwargs = {}
+    if endpoint.data is not None:
+        kwargs['data'] = endpoint.data(context, iteration)
+    return getattr(client, endpoint.method)(
+        endpoint.path(context, iteration), **kwargs
+    )
+
+
+def measure(endpoint, context, repeat, warmup):
+    """
+    Замеры одного эндпоинта: задержки - по repeat запросам без
+    инструментирования, число запросов к БД и пик памяти - по отдельному
+    запросу, чтобы tracemalloc не искажал время
+    """
+    iteration = 0
+    for _ in range(warmup):
+        call(endpoint, context, iteration)
+        iteration += 1
+    timings, errors = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = call(endpoint, context, iteration)
+        timings.append((time.perf_counter() - started) * 1000)
+        iteration += 1
+        errors += response.status_code >= 400
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            call(endpoint, context, iteration)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'requests': repeat,
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': len(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(repeat, warmup=0, names=None):
+    """Замеры всех эндпоинтов (или только names) на текущих данных БД"""
+    reset_process_state()
+    context = benchmark_context()
+    return {
+        endpoint.name: measure(endpoint, context, repeat, warmup)
+        for endpoint in ENDPOINTS
+        if not names or endpoint.name in names
+    }
+
+
+def compare_renderers(repeat, names=RENDERED_ENDPOINTS):
+    """
+    Время рендеринга ответов эндпоинтов стандартным JSONRenderer
+    и FastJSONRenderer на одних и тех же данных
+    """
+    reset_process_state()
+    context = benchmark_context()
+    results = {}
+    for endpoint in ENDPOINTS:
+        if endpoint.name not in names:
+            continue
+        data = call(endpoint, context, 0).data
+        timings = {}
+        for name, renderer_class in RENDERERS:
+            renderer = renderer_class()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                renderer.render(data)
+            timings[name] = (time.perf_counter() - started) / repeat * 1000
+        results[endpoint.name] = {
+            'json_ms': round(timings['json'], 4),
+            'fast_ms': round(timings['fast'], 4),
+            'speedup': round(timings['json'] / timings['fast'], 2),
+        }
+    return results
+
+
+def environment():
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Сравнивает результаты с базовой линией. Регрессия - рост числа запросов
+    к БД или рост задержки и памяти больше чем на долю threshold
+    """
+    comparisons = []
+    for scale, endpoints in current['results'].items():
+        for name, metrics in endpoints.items():
+            previous = baseline['results'].get(scale, {}).get(name)
+            if previous is None:
+                continue
+            for metric in COMPARED_METRICS:
+                before, after = previous[metric], metrics[metric]
+                change = (after - before) / before if before else 0.0
+                if metric == 'queries':
+                    regression = after > before
+                else:
+                    regression = change > threshold
+                comparisons.append(Comparison(scale, name, metric, before,
+                                              after, change, regression))
+    return comparisons
+
+
+def format_report(comparisons):
+    lines = [f'{"scale":>8}  {"endpoint":<18} {"metric":<15}'
+             f'{"baseline":>11}{"current":>11}{"change":>9}']
+    for item in comparisons:
+        mark = '  РЕГРЕССИЯ' if item.regression else ''
+        lines.append(
+            f'{item.scale:>8}  {item.endpoint:<18} {item.metric:<15}'
+            f'{item.baseline:>11}{item.current:>11}{item.change:>+9.1%}{mark}'
+        )
+    return '\n'.join(lines)
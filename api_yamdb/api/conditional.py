@@ -0,0 +1,98 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from reviews.versions import GLOBAL, get_versions
+
+
+class ConditionalGetMixin:
+    """
+    Основа условных GET-запросов. ETag строится по версиям
+    ресурсов, от которых зависит ответ (get_version_keys), поэтому на
+    If-None-Match ответ 304 отдаётся до выполнения основного запроса
+    и сериализации
+    """
+
+    def get_version_keys(self):
+        raise NotImplementedError(
+            'Укажите версии ресурсов, от которых зависит ответ'
+        )
+
+    def get_resource_versions(self):
+        """Версии ресурсов ответа; читаются один раз за запрос"""
+        if getattr(self, '_resource_versions', None) is None:
+            keys = [GLOBAL, *self.get_version_keys()]
+            versions = get_versions(keys)
+            self._resource_versions = [(key, versions[key]) for key in keys]
+        return self._resource_versions
+
+    def get_request_fingerprint(self, request):
+        """Отпечаток запроса и версий ресурсов, от которых зависит ответ"""
+        fingerprint = '|'.join([
+            request.build_absolute_uri(),
+            request.accepted_media_type or '',
+            *(f'{key}={version}'
+              for key, version in self.get_resource_versions()),
+        ])
+        return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def get_etag(self, request):
+        return '"{}"'.format(self.get_request_fingerprint(request))
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH',
+                                                     ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+    """ETag и ответ 304 для списка объектов"""
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request,
+                                         *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """ETag и ответ 304 для отдельного объекта"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request,
+                                         *args, **kwargs)
+
+
+class CachedListMixin(ConditionalGetMixin):
+    """
+    Кеш ответов списка, ключ которого включает версии ресурсов. Изменение
+    данных меняет версию и тем самым ключ, а при попадании в кеш запрос
+    к БД и сериализация не выполняются
+    """
+    cache_alias = None
+
+    def get_cache(self):
+        return caches[self.cache_alias or settings.CATALOG_CACHE_ALIAS]
+
+    def list(self, request, *args, **kwargs):
+        cache = self.get_cache()
+        key = f'list:{self.basename}:{self.get_request_fingerprint(request)}'
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data)
+        return response
@@ -0,0 +1,105 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_field_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def select_related_paths(select_related, prefix=''):
+    """Пути select_related из дерева query.select_related"""
+    for name, nested in select_related.items():
+        path = prefix + name
+        yield path
+        yield from select_related_paths(nested, path + '__')
+
+
+def prune_queryset(queryset, serializer, fields):
+    """
+    Оставляет в queryset только то, что нужно полям fields сериализатора:
+    .only() по их колонкам, select_related и prefetch_related только для
+    запрошенных связей
+    """
+    sources = {serializer.fields[name].source.split('.')[0]
+               for name in fields}
+    model = queryset.model
+    query = queryset.query
+    if isinstance(query.select_related, dict):
+        paths = [path for path in select_related_paths(query.select_related)
+                 if path.split('__')[0] in sources]
+        queryset = queryset.select_related(None)
+        if paths:
+            queryset = queryset.select_related(*paths)
+    lookups = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if getattr(lookup, 'prefetch_through', lookup).split('__')[0]
+        in sources
+    ]
+    queryset = queryset.prefetch_related(None)
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+    return queryset.only(*[field.name for field in model._meta.concrete_fields
+                           if field.name in sources or field.primary_key])
+
+
+class SparseFieldsetMixin:
+    """
+    Частичные ответы list и retrieve: ?fields=id,name оставляет только
+    перечисленные поля, ?omit=description убирает поля из ответа.
+    Ненужные поля не сериализуются и не выбираются из БД
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    sparse_actions = ('list', 'retrieve')
+
+    def get_requested_fields(self):
+        """Поля ответа или None, если нужен полный ответ"""
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.parse_requested_fields()
+        return self._requested_fields
+
+    def parse_requested_fields(self):
+        params = self.request.query_params
+        if (self.action not in self.sparse_actions
+                or not (params.get(self.fields_query_param)
+                        or params.get(self.omit_query_param))):
+            return None
+        available = list(self.get_serializer_class()().fields)
+        errors = {}
+        requested = {}
+        for param in (self.fields_query_param, self.omit_query_param):
+            names = parse_field_names(params.get(param, ''))
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = [
+                    f'Неизвестные поля: {", ".join(unknown)}. '
+                    f'Доступные поля: {", ".join(available)}'
+                ]
+            requested[param] = names
+        if errors:
+            raise ValidationError(errors)
+        fields = requested[self.fields_query_param] or available
+        omit = requested[self.omit_query_param]
+        return tuple(name for name in available
+                     if name in fields and name not in omit)
+
+    def is_field_requested(self, name):
+        fields = self.get_requested_fields()
+        return fields is None or name in fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        return prune_queryset(queryset, self.get_serializer_class()(),
+                              fields)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_requested_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    del target.fields[name]
+        return serializer
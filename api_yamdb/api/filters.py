@@ -1,17 +1,134 @@
+from django import forms
 from django_filters import rest_framework as filters
+from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.widgets import BaseCSVWidget
 
-from reviews.models import Category, Genre, Title
+from reviews.bitmaps import (ANY, GENRE_MODES, decade_of, filter_bitmap,
+                             ids_bitmap, title_bitmap_index)
+from reviews.models import Title
+from reviews.search import get_search_backend
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """
+    Сортировка с дополнительным упорядочиванием по id, чтобы страницы
+    не перемешивались при одинаковых значениях поля сортировки
+    """
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, '-id')
+        return qs
+
+
+class SlugListWidget(BaseCSVWidget, forms.TextInput):
+    """
+    Значения повторяющегося параметра объединяются:
+    ?genre=drama&genre=comedy,horror - три slug-а
+    """
+
+    def value_from_datadict(self, data, files, name):
+        if not hasattr(data, 'getlist'):
+            return super().value_from_datadict(data, files, name)
+        values = data.getlist(name)
+        if not values:
+            return None
+        return [slug for value in values if value
+                for slug in value.split(',')]
+
+
+class SlugListFilter(filters.BaseCSVFilter, filters.CharFilter):
+    """
+    Список slug-ов через запятую или в нескольких параметрах:
+    ?genre=drama,comedy или ?genre=drama&genre=comedy
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', SlugListWidget)
+        super().__init__(*args, **kwargs)
 
 
 class TitleFilter(filters.FilterSet):
-    genre = filters.ModelMultipleChoiceFilter(field_name='genre__slug',
-                                              to_field_name='slug',
-                                              queryset=Genre.objects.all())
-    category = filters.ModelChoiceFilter(field_name='category',
-                                         to_field_name='slug',
-                                         queryset=Category.objects.all())
+    # Жанры, категория и год проверяются вместе по битовым картам в памяти
+    # (см. filter_queryset), без JOIN-ов и проверки slug-ов запросами к БД
+    genre = SlugListFilter(method='filter_by_index')
+    genre_mode = filters.ChoiceFilter(
+        choices=[(mode, mode) for mode in GENRE_MODES],
+        method='filter_by_index'
+    )
+    category = filters.CharFilter(method='filter_by_index')
+    year = filters.NumberFilter(method='filter_by_index')
+    decade = filters.NumberFilter(method='filter_by_index')
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    rating_min = filters.NumberFilter(field_name='rating', lookup_expr='gte')
+    rating_max = filters.NumberFilter(field_name='rating', lookup_expr='lte')
+    # Полнотекстовый поиск по названию и описанию с сортировкой по
+    # релевантности; объявлен до ordering, чтобы явная сортировка
+    # имела приоритет
+    q = filters.CharFilter(method='filter_q')
+    ordering = StableOrderingFilter(fields=('rating', 'year', 'name'))
 
     class Meta:
         model = Title
-        fields = ('genre', 'category', 'name', 'year')
+        fields = ('genre', 'genre_mode', 'category', 'name', 'year',
+                  'decade', 'rating_min', 'rating_max', 'q')
+
+    # Фильтры, которые проверяются по индексу в памяти
+    INDEX_FILTERS = ('genre', 'genre_mode', 'category', 'year', 'decade')
+
+    def __init__(self, *args, catalog_version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Версия каталога, прочитанная запросом для ETag: индекс в памяти
+        # не должен быть старше неё, иначе устаревший ответ получит
+        # новый ETag
+        self.catalog_version = catalog_version
+
+    def filter_by_index(self, queryset, name, value):
+        return queryset
+
+    def index_bitmap(self):
+        """
+        Битовая карта произведений по жанрам, категории, году
+        и десятилетию или None, если эти фильтры не заданы
+        """
+        data = self.form.cleaned_data
+        year, decade = data.get('year'), data.get('decade')
+        return title_bitmap_index.select(
+            genres=data.get('genre'),
+            mode=data.get('genre_mode') or ANY,
+            category=data.get('category') or None,
+            year=None if year is None else int(year),
+            decade=None if decade is None else decade_of(int(decade)),
+            version=self.catalog_version,
+        )
+
+    def result_bitmap(self):
+        """
+        Битовая карта всей отфильтрованной выборки (None - весь каталог).
+        Если заданы только фильтры индекса, обходится без запросов к БД
+        """
+        sql_filters = [name for name, value in self.form.cleaned_data.items()
+                       if name not in self.INDEX_FILTERS
+                       and name != 'ordering' and value not in (None, '')]
+        if not sql_filters:
+            return self.index_bitmap()
+        return ids_bitmap(self.qs.order_by().values_list('id', flat=True))
+
+    def filter_queryset(self, queryset):
+        bitmap = self.index_bitmap()
+        if bitmap is not None:
+            queryset = filter_bitmap(queryset, bitmap)
+        return super().filter_queryset(queryset)
+
+    def filter_q(self, queryset, name, value):
+        return get_search_backend().filter_titles(queryset, value)
+
+
+class CatalogFilterBackend(DjangoFilterBackend):
+    """Передаёт фильтру версию каталога ответа (view.get_catalog_version)"""
+
+    def get_filterset_kwargs(self, request, queryset, view):
+        kwargs = super().get_filterset_kwargs(request, queryset, view)
+        kwargs['catalog_version'] = view.get_catalog_version()
+        return kwargs
@@ -0,0 +1,112 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmark import (ENDPOINTS, compare_renderers, compare_results,
+                           environment, format_report, run_benchmark, seed)
+
+DEFAULT_SCALE = 10000
+DEFAULT_REPEAT = 50
+DEFAULT_WARMUP = 5
+DEFAULT_THRESHOLD = 0.2
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочные замеры эндпоинтов API на синтетических данных: '
+            'задержка p50/p95, число запросов к БД и пик памяти на запрос. '
+            'Каждый масштаб замеряется на отдельной тестовой БД, рабочая '
+            'БД не затрагивается')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=int, action='append', dest='scales',
+            help=('Примерное число отзывов (и комментариев) в синтетических '
+                  'данных; можно указать несколько раз. По умолчанию '
+                  f'{DEFAULT_SCALE}')
+        )
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                            help='Число замеряемых запросов на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP,
+                            help='Число прогревочных запросов на эндпоинт')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=[endpoint.name for endpoint in ENDPOINTS],
+            help='Замерять только указанные эндпоинты'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для генерации данных (generate_data)'
+        )
+        parser.add_argument('--output',
+                            help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline',
+                            help='JSON-файл с базовой линией для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Допустимый рост задержки и памяти (доля), по умолчанию 0.2'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если найдены регрессии'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        report = {'environment': environment(), 'results': {},
+                  'renderers': {}}
+        setup_test_environment()
+        try:
+            for scale in options['scales'] or [DEFAULT_SCALE]:
+                (report['results'][str(scale)],
+                 report['renderers'][str(scale)]) = self.run_scale(scale,
+                                                                   options)
+        finally:
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+        if baseline is None:
+            return
+        comparisons = compare_results(baseline, report,
+                                      options['threshold'])
+        self.stdout.write(format_report(comparisons))
+        regressions = [item for item in comparisons if item.regression]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+
+    def run_scale(self, scale, options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            self.stdout.write(f'Масштаб {scale}: генерация данных')
+            seed(scale, options['workers'])
+            results = run_benchmark(options['repeat'], options['warmup'],
+                                    options['endpoints'])
+            renderers = compare_renderers(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{scale:>8}  {name:<18} p50 {metrics["p50_ms"]:>8} мс  '
+                f'p95 {metrics["p95_ms"]:>8} мс  '
+                f'запросов {metrics["queries"]:>3}  '
+                f'память {metrics["peak_memory_kb"]:>8} КБ  '
+                f'ошибок {metrics["errors"]}'
+            )
+        for name, timings in renderers.items():
+            self.stdout.write(
+                f'{scale:>8}  {name:<18} рендеринг JSON '
+                f'{timings["json_ms"]} мс, orjson {timings["fast_ms"]} мс '
+                f'(в {timings["speedup"]} раза быстрее)'
+            )
+        return results, renderers
@@ -0,0 +1,55 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.slow_queries import read_log, summarize
+
+DEFAULT_TOP = 20
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов: запросы, сгруппированные '
+            'по SQL без значений, с числом, суммарным и максимальным '
+            'временем, view и планом выполнения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Файл журнала (файлы ротации читаются вместе с ним)'
+        )
+        parser.add_argument('--top', type=int, default=DEFAULT_TOP,
+                            help='Сколько самых затратных запросов вывести')
+        parser.add_argument('--view',
+                            help='Только запросы указанного view, '
+                                 'например reviews-list')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести сводку в JSON')
+
+    def handle(self, *args, **options):
+        records = read_log(options['log'])
+        if options['view']:
+            records = (record for record in records
+                       if record.get('view') == options['view'])
+        groups = summarize(records)[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(groups, ensure_ascii=False,
+                                         indent=2))
+            return
+        if not groups:
+            self.stdout.write('Медленных запросов не найдено')
+            return
+        for group in groups:
+            self.stdout.write(
+                f'{group["fingerprint"]}  раз {group["count"]}  '
+                f'всего {group["total_ms"]} мс  '
+                f'среднее {group["avg_ms"]} мс  '
+                f'максимум {group["max_ms"]} мс'
+            )
+            self.stdout.write(f'  SQL: {group["sql"]}')
+            if group['views']:
+                self.stdout.write(f'  view: {", ".join(group["views"])}')
+            for frame in group['frames']:
+                self.stdout.write(f'  код: {frame}')
+            for line in group['plan'] or ():
+                self.stdout.write(f'  план: {line}')
@@ -0,0 +1,254 @@
+import hmac
+import threading
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import partial
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм: секунды и число запросов к БД
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# Прочие методы попадают в метку other, чтобы произвольные методы
+# запросов не раздували число временных рядов
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE',
+                           'OPTIONS'))
+UNRESOLVED_ROUTE = 'unresolved'
+
+Metric = namedtuple('Metric', 'name help buckets')
+
+REQUEST_DURATION = Metric('yamdb_http_request_duration_seconds',
+                          'Полное время обработки запроса',
+                          DURATION_BUCKETS)
+DB_QUERIES = Metric('yamdb_db_queries_per_request',
+                    'Число запросов к БД за один HTTP-запрос',
+                    QUERY_BUCKETS)
+DB_DURATION = Metric('yamdb_db_duration_seconds',
+                     'Суммарное время запросов к БД за один HTTP-запрос',
+                     DURATION_BUCKETS)
+SERIALIZER_DURATION = Metric(
+    'yamdb_serializer_duration_seconds',
+    'Время сериализации и валидации (вместе с их запросами к БД)',
+    DURATION_BUCKETS
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION)
+REQUESTS_TOTAL = Metric('yamdb_http_requests_total',
+                        'Число запросов по маршрутам и кодам ответа', None)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (без накопления)"""
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Пары (граница, число наблюдений не больше неё) с +Inf в конце"""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """
+    Счётчики одного HTTP-запроса. Экземпляр подключается к соединениям
+    с БД как execute_wrapper и считает запросы и их время
+    """
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.queries += 1
+
+    def add(self, other):
+        """Прибавляет счётчики, собранные в другом потоке"""
+        self.queries += other.queries
+        self.db_time += other.db_time
+        self.serializer_time += other.serializer_time
+
+
+current_request_metrics = ContextVar('current_request_metrics', default=None)
+
+
+def timed_serialization(method, *args):
+    """
+    Вызывает method и прибавляет его время ко времени сериализации запроса.
+    Вложенные сериализаторы не замеряются повторно
+    """
+    metrics = current_request_metrics.get()
+    if metrics is None or metrics.serializing:
+        return method(*args)
+    metrics.serializing = True
+    started = perf_counter()
+    try:
+        return method(*args)
+    finally:
+        metrics.serializer_time += perf_counter() - started
+        metrics.serializing = False
+
+
+class TimedSerializerViewMixin:
+    """
+    Учитывает в метриках запроса время to_representation и валидации
+    сериализаторов из get_serializer (для many=True - всего списка сразу)
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_request_metrics.get() is not None:
+            for name in ('to_representation', 'run_validation'):
+                method = getattr(serializer, name)
+                setattr(serializer, name, partial(timed_serialization, method))
+        return serializer
+
+
+def escape_label(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def format_labels(**labels):
+    return '{' + ','.join(f'{name}="{escape_label(value)}"'
+                          for name, value in labels.items()) + '}'
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов, накопленные в памяти процесса. Наблюдения
+    группируются по имени маршрута и методу HTTP
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {metric: {} for metric in HISTOGRAMS}
+            self._requests = defaultdict(int)
+
+    def observe(self, route, method, status, duration, metrics):
+        labels = (route, method)
+        values = (
+            (REQUEST_DURATION, duration),
+            (DB_QUERIES, metrics.queries),
+            (DB_DURATION, metrics.db_time),
+            (SERIALIZER_DURATION, metrics.serializer_time),
+        )
+        with self._lock:
+            for metric, value in values:
+                histograms = self._histograms[metric]
+                histogram = histograms.get(labels)
+                if histogram is None:
+                    histogram = histograms[labels] = Histogram(metric.buckets)
+                histogram.observe(value)
+            self._requests[(route, method, status)] += 1
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            for metric in HISTOGRAMS:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} histogram')
+                for (route, method), histogram in sorted(
+                        self._histograms[metric].items()):
+                    for bound, count in histogram.cumulative():
+                        labels = format_labels(route=route, method=method,
+                                               le=bound)
+                        lines.append(f'{metric.name}_bucket{labels} {count}')
+                    labels = format_labels(route=route, method=method)
+                    lines.append(f'{metric.name}_sum{labels} {histogram.sum}')
+                    lines.append(
+                        f'{metric.name}_count{labels} {sum(histogram.counts)}'
+                    )
+            lines.append(f'# HELP {REQUESTS_TOTAL.name} {REQUESTS_TOTAL.help}')
+            lines.append(f'# TYPE {REQUESTS_TOTAL.name} counter')
+            for (route, method, status), count in sorted(
+                    self._requests.items()):
+                labels = format_labels(route=route, method=method,
+                                       status=status)
+                lines.append(f'{REQUESTS_TOTAL.name}{labels} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+
+
+def route_name(request):
+    """Имя маршрута, например titles-list; для 404 - unresolved"""
+    match = request.resolver_match
+    return match.view_name if match is not None else UNRESOLVED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Собирает по маршрутам задержку, число и время запросов к БД и время
+    сериализации. Отключается настройкой METRICS_ENABLED. Для потоковых
+    ответов задержка считается до начала отдачи тела
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        metrics_registry.observe(route_name(request), method,
+                                 response.status_code,
+                                 perf_counter() - started, metrics)
+        return response
+
+
+def metrics_view(request):
+    """
+    Метрики процесса для Prometheus. Если задан METRICS_TOKEN, требуется
+    заголовок Authorization: Bearer <токен>
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'.encode()
+        received = request.META.get('HTTP_AUTHORIZATION', '').encode()
+        if not hmac.compare_digest(received, expected):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics_registry.render(), content_type=CONTENT_TYPE)
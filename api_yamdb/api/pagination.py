@@ -0,0 +1,93 @@
+from django.core import signing
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.utils.urls import replace_query_param
+
+
+class SignedCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация по ключу `-id`. Курсоры подписаны
+    SECRET_KEY, поэтому их нельзя подделать, а общее количество объектов
+    не считается
+    """
+    ordering = '-id'
+    signing_salt = 'api.pagination.SignedCursorPagination'
+
+    def encode_cursor(self, cursor):
+        encoded = signing.dumps(
+            [cursor.offset, int(cursor.reverse), cursor.position],
+            salt=self.signing_salt,
+            compress=True,
+        )
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            offset, reverse, position = signing.loads(
+                encoded, salt=self.signing_salt
+            )
+            offset = min(max(int(offset), 0), self.offset_cutoff)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=offset, reverse=bool(reverse), position=position)
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    По умолчанию постраничная пагинация (обратная совместимость).
+    С параметром `?pagination=cursor` или при наличии `?cursor=`
+    включается курсорная пагинация без COUNT(*) и OFFSET
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_pagination_class = SignedCursorPagination
+    # Параметры, задающие свою сортировку (поле сортировки, релевантность
+    # поиска): курсор строится только по `-id`, поэтому с ними курсорная
+    # пагинация отклоняется, а не сортирует выдачу молча по-другому
+    ordering_query_params = ('ordering', 'q')
+
+    cursor_paginator = None
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def check_cursor_ordering(self, request):
+        params = [param for param in self.ordering_query_params
+                  if request.query_params.get(param)]
+        if params:
+            raise ValidationError({self.mode_query_param: [
+                'Курсорная пагинация поддерживает только сортировку '
+                'по id; уберите параметры ' + ', '.join(params)
+            ]})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.check_cursor_ordering(request)
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request,
+                                                           view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -0,0 +1,156 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import StatelessJWTAuthentication
+from api.metrics import RequestMetrics, current_request_metrics, route_name
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+PROFILE_MODES = (CPROFILE, SAMPLE)
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик одного потока: фоновый поток с заданным
+    интервалом снимает его стек. Интервал ограничен снизу интервалом
+    переключения GIL (sys.getswitchinterval), пока поток занят Python-кодом
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.stack(frame)] += 1
+
+    @staticmethod
+    def stack(frame):
+        names = []
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '?')
+            names.append(f'{module}:{frame.f_code.co_name}')
+            frame = frame.f_back
+        return tuple(reversed(names))
+
+    def collapsed(self):
+        """Стеки в формате collapsed stacks (flamegraph.pl, speedscope)"""
+        return ''.join(f'{";".join(stack)} {count}\n'
+                       for stack, count in sorted(self.stacks.items()))
+
+
+def is_admin_request(request):
+    """Проверяет JWT из запроса: профилировать могут только администраторы"""
+    try:
+        authenticated = StatelessJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    if authenticated is None:
+        return False
+    user = authenticated[0]
+    return user.is_admin or user.is_superuser
+
+
+def profile_path(request, mode):
+    route = re.sub(r'[^\w.-]', '_', route_name(request))
+    extension = 'prof' if mode == CPROFILE else 'folded'
+    name = (f'{datetime.now():%Y%m%d-%H%M%S-%f}-{route}-{request.method}'
+            f'.{extension}')
+    return os.path.join(settings.PROFILING_DIR, name)
+
+
+def server_timing(total, metrics, queries, db_time, serializer_time, path):
+    return ', '.join((
+        f'total;dur={total * 1000:.1f}',
+        (f'db;dur={(metrics.db_time - db_time) * 1000:.1f};'
+         f'desc="{metrics.queries - queries} queries"'),
+        (f'serializer;dur='
+         f'{(metrics.serializer_time - serializer_time) * 1000:.1f}'),
+        f'profile;desc="{os.path.basename(path)}"',
+    ))
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует один запрос по заголовку X-Profile: cprofile (файл pstats)
+    или sample (collapsed stacks). Файлы пишутся в PROFILING_DIR, разбивка
+    времени возвращается в заголовке Server-Timing. Профилировать могут
+    только администраторы; запросы без заголовка проходят без накладных
+    расходов
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get(PROFILE_HEADER)
+        if mode not in PROFILE_MODES or not is_admin_request(request):
+            return self.get_response(request)
+        with ExitStack() as stack:
+            metrics = current_request_metrics.get()
+            if metrics is None:
+                # Метрики отключены: считаем запросы к БД сами
+                metrics = RequestMetrics()
+                token = current_request_metrics.set(metrics)
+                stack.callback(current_request_metrics.reset, token)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+            queries, db_time = metrics.queries, metrics.db_time
+            serializer_time = metrics.serializer_time
+            started = perf_counter()
+            response, write_profile = self.profile(request, mode)
+            total = perf_counter() - started
+        path = profile_path(request, mode)
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        write_profile(path)
+        response['Server-Timing'] = server_timing(
+            total, metrics, queries, db_time, serializer_time, path
+        )
+        return response
+
+    def profile(self, request, mode):
+        """Ответ и функция, записывающая профиль в файл"""
+        if mode == CPROFILE:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            return response, profiler.dump_stats
+        sampler = StackSampler(threading.get_ident(),
+                               settings.PROFILING_SAMPLE_INTERVAL)
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+
+        def write_collapsed(path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(sampler.collapsed())
+        return response, write_collapsed
@@ -0,0 +1,228 @@
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from rest_framework.fields import DateTimeField, FloatField
+from rest_framework.response import Response
+
+from api.fieldsets import SparseFieldsetMixin
+from api.metrics import timed_serialization
+from reviews.models import Comment, Review, Title
+
+# Поля сериализаторов используются только для форматирования значений,
+# поэтому даты и числа выводятся так же, как в ответах сериализаторов
+DATETIME = DateTimeField()
+FLOAT = FloatField()
+
+
+def optional(field, value):
+    # Сериализатор не вызывает поле для None
+    return None if value is None else field.to_representation(value)
+
+
+class Projection:
+    """
+    Чтение без сериализаторов: из БД выбираются только колонки ответа
+    (.values() с JOIN-ами), а словари ответа собираются напрямую. Формат
+    ответа совпадает с сериализатором (см. контрактный тест)
+    """
+    # Поле ответа -> колонки .values(), из которых оно строится
+    columns = {}
+
+    def __init__(self, fields=None):
+        self.fields = tuple(field for field in self.columns
+                            if fields is None or field in fields)
+
+    def values(self, queryset, *extra):
+        # id нужен курсорной пагинации и связанным спискам, даже если
+        # его нет в ответе
+        columns = dict.fromkeys(['id', *(column for field in self.fields
+                                         for column in self.columns[field]),
+                                 *extra])
+        # prefetch_related с .values() не работает: связанные списки
+        # загружаются одним запросом на страницу в getter()
+        return queryset.prefetch_related(None).values(*columns)
+
+    def represent(self, rows):
+        """Словари ответа для строк .values(); время идёт в метрики"""
+        return timed_serialization(self.build, list(rows))
+
+    def build(self, rows):
+        getters = [(field, self.getter(field, rows)) for field in self.fields]
+        return [{field: get(row) for field, get in getters} for row in rows]
+
+    def getter(self, field, rows):
+        """Функция, возвращающая значение поля ответа по строке"""
+        column, = self.columns[field]
+        return itemgetter(column)
+
+
+class TitleProjection(Projection):
+    """Формат TitleSerializer"""
+    columns = {
+        'id': ('id',),
+        'name': ('name',),
+        'year': ('year',),
+        'rating': ('rating',),
+        'description': ('description',),
+        'genre': (),
+        'category': ('category__name', 'category__slug'),
+    }
+
+    def genres(self, ids):
+        # Порядок как у prefetch_related('genre'): по Genre.Meta.ordering
+        genres = {}
+        links = Title.genre.through.objects.filter(
+            title_id__in=ids
+        ).order_by('-genre_id').values_list('title_id', 'genre__name',
+                                            'genre__slug')
+        for title_id, name, slug in links:
+            genres.setdefault(title_id, []).append({'name': name,
+                                                    'slug': slug})
+        return genres
+
+    def getter(self, field, rows):
+        if field == 'rating':
+            return lambda row: optional(FLOAT, row['rating'])
+        if field == 'genre':
+            genres = self.genres([row['id'] for row in rows]) if rows else {}
+            return lambda row: genres.get(row['id'], [])
+        if field == 'category':
+            return lambda row: None if row['category__slug'] is None else {
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+            }
+        return super().getter(field, rows)
+
+
+class ReviewProjection(Projection):
+    """Формат ReviewSerializer"""
+    columns = {
+        'id': ('id',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'score': ('score',),
+        'pub_date': ('pub_date',),
+        'title': ('title_id',),
+    }
+
+    def getter(self, field, rows):
+        if field == 'pub_date':
+            return lambda row: optional(DATETIME, row['pub_date'])
+        return super().getter(field, rows)
+
+
+class CommentProjection(Projection):
+    """Формат CommentSerializer"""
+    columns = {
+        'id': ('id',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'pub_date': ('pub_date',),
+    }
+
+    def getter(self, field, rows):
+        if field == 'pub_date':
+            return lambda row: optional(DATETIME, row['pub_date'])
+        return super().getter(field, rows)
+
+
+def expand_reviews(review_ids, comments_limit=None):
+    """
+    Отзывы review_ids в порядке списка отзывов и, если задан
+    comments_limit, не больше comments_limit последних комментариев
+    к каждому. Два запроса при любом числе отзывов
+    """
+    reviews = ReviewProjection()
+    data = reviews.represent(
+        reviews.values(Review.objects.filter(id__in=review_ids)
+                       .order_by('-id'))
+    )
+    if comments_limit is None:
+        return data
+    # Последние комментарии каждого отзыва: коррелированный подзапрос
+    # с LIMIT по индексу review_id, одним запросом на все отзывы
+    latest = Comment.objects.filter(
+        review_id=OuterRef('review_id')
+    ).order_by('-id').values('id')[:comments_limit]
+    comments = CommentProjection()
+    rows = list(comments.values(
+        Comment.objects.filter(review_id__in=review_ids,
+                               id__in=Subquery(latest)).order_by('-id'),
+        'review_id'
+    ))
+    by_review = {}
+    for row, comment in zip(rows, comments.represent(rows)):
+        by_review.setdefault(row['review_id'], []).append(comment)
+    for review in data:
+        review['comments'] = by_review.get(review['id'], [])
+    return data
+
+
+class ProjectionObject:
+    """
+    Объект для проверки прав в ProjectedReadMixin.retrieve вместо модели:
+    строка .values() не заменяет экземпляр, поэтому обращение к любому
+    атрибуту - ошибка конфигурации view
+    """
+
+    def __init__(self, view):
+        self._view_name = type(view).__name__
+
+    def __getattr__(self, name):
+        raise ImproperlyConfigured(
+            f'Права на объект у {self._view_name} читают атрибут {name}: '
+            'для чтения через проекции права на объект должны разрешать '
+            'безопасные методы, не обращаясь к объекту'
+        )
+
+
+class ProjectedReadMixin(SparseFieldsetMixin):
+    """
+    list и retrieve через projection_class вместо сериализатора.
+    Фильтры, поиск, сортировка, пагинация и ?fields= / ?omit= применяются
+    так же, как обычно. Отключается настройкой READ_PROJECTIONS_ENABLED.
+
+    Только для view, права на объект которых разрешают безопасные методы,
+    не читая объект (ReadOnly и т.п.): в retrieve вместо экземпляра модели
+    проверяется ProjectionObject
+    """
+    projection_class = None
+
+    def use_projection(self):
+        return (settings.READ_PROJECTIONS_ENABLED
+                and self.projection_class is not None)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_projection():
+            return super().list(request, *args, **kwargs)
+        projection = self.projection_class(self.get_requested_fields())
+        queryset = projection.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projection.represent(page))
+        return Response(projection.represent(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_projection():
+            return super().retrieve(request, *args, **kwargs)
+        projection = self.projection_class(self.get_requested_fields())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = projection.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        try:
+            row = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).first()
+        except (TypeError, ValueError, ValidationError):
+            # Как get_object_or_404 в GenericAPIView.get_object
+            row = None
+        if row is None:
+            raise Http404
+        self.check_object_permissions(request, ProjectionObject(self))
+        return Response(projection.represent([row])[0])
@@ -0,0 +1,78 @@
+import logging
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.query_budget')
+
+
+class QueryBudgetExceeded(Exception):
+    """View выполнил больше запросов к БД, чем ему разрешено"""
+
+
+class QueryTracker:
+    """execute_wrapper, считающий запросы и повторы одинакового SQL"""
+    __slots__ = ('count', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements[sql] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, limit):
+        """
+        SELECT, выполненный не меньше limit раз с разными параметрами.
+        Повторы записи (каскадное удаление с сигналами по каждому
+        объекту) ограничиваются бюджетом, а не считаются N+1
+        """
+        return [(sql, count) for sql, count in self.statements.items()
+                if count >= limit
+                and sql.lstrip()[:6].upper() == 'SELECT']
+
+
+class QueryBudgetMixin:
+    """
+    Бюджет запросов к БД для ViewSet: max_queries на любое действие
+    и action_max_queries для отдельных действий. Кроме бюджета проверяются
+    повторы одного и того же SQL (N+1). Нарушения записываются в журнал,
+    а с QUERY_BUDGET_RAISE = True (тесты) вызывают QueryBudgetExceeded
+    """
+    max_queries = None
+    action_max_queries = {}
+
+    def get_query_budget(self):
+        return self.action_max_queries.get(self.action, self.max_queries)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return super().dispatch(request, *args, **kwargs)
+        tracker = QueryTracker()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(tracker))
+            response = super().dispatch(request, *args, **kwargs)
+        self.check_query_budget(tracker)
+        return response
+
+    def check_query_budget(self, tracker):
+        problems = []
+        budget = self.get_query_budget()
+        if budget is not None and tracker.count > budget:
+            problems.append(f'{tracker.count} запросов к БД при бюджете '
+                            f'{budget}')
+        for sql, count in tracker.repeated(settings.QUERY_REPEAT_LIMIT):
+            problems.append(f'N+1: {count} раз выполнен запрос {sql}')
+        if not problems:
+            return
+        message = (f'{type(self).__name__}.{self.action} '
+                   f'({self.request.method} {self.request.path}): '
+                   + '; '.join(problems))
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,109 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSONRenderer экранирует эти символы, чтобы ответ оставался допустимым
+# JavaScript; orjson выводит их как есть
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Вывод совпадает с JSONRenderer при настройках
+    DRF по умолчанию (компактный UTF-8, даты в ISO 8601 с Z для UTC);
+    типы, которых orjson не знает, преобразуются кодировщиком DRF.
+    Отступы (?indent, BrowsableAPI), ensure_ascii и отсутствие orjson
+    обрабатываются стандартным json
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if data is None:
+            return b''
+        try:
+            rendered = orjson.dumps(
+                data, default=JSONEncoder().default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            # Например, целые числа больше 64 бит
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if LINE_SEPARATOR in rendered or PARAGRAPH_SEPARATOR in rendered:
+            rendered = (rendered.replace(LINE_SEPARATOR, b'\\u2028')
+                        .replace(PARAGRAPH_SEPARATOR, b'\\u2029'))
+        return rendered
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson; без orjson и для кодировок кроме UTF-8 - json"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding',
+                                              settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class CompactJSONRenderer(FastJSONRenderer):
+    """
+    Компактный формат списка произведений (?format=compact или
+    Accept: application/vnd.yamdb.compact+json): жанры и категория
+    заменяются на slug-и, а сами объекты один раз выводятся в разделе
+    included верхнего уровня ответа. Ошибки выводятся без изменений
+    """
+    media_type = 'application/vnd.yamdb.compact+json'
+    format = 'compact'
+    # Поле с вложенными объектами -> раздел included
+    side_loaded = (('genre', 'genres'), ('category', 'categories'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if isinstance(data, dict) and not (response is not None
+                                           and response.exception):
+            data = self.compact(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def compact(self, data):
+        included = {section: {} for _, section in self.side_loaded}
+        if 'results' in data:
+            data = dict(data)
+            data['results'] = [self.compact_object(item, included)
+                               for item in data['results']]
+        else:
+            data = self.compact_object(data, included)
+        data['included'] = {section: list(objects.values())
+                            for section, objects in included.items()}
+        return data
+
+    def compact_object(self, item, included):
+        item = dict(item)
+        for field, section in self.side_loaded:
+            value = item.get(field)
+            if isinstance(value, list):
+                item[field] = [self.include(obj, included[section])
+                               for obj in value]
+            elif isinstance(value, dict):
+                item[field] = self.include(value, included[section])
+        return item
+
+    def include(self, obj, objects):
+        objects.setdefault(obj['slug'], obj)
+        return obj['slug']
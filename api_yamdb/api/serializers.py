@@ -1,11 +1,15 @@
 import re
+from urllib.parse import urlsplit
 
-from django.db.models import Avg
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import validators
-from rest_framework.generics import get_object_or_404
-from rest_framework.relations import SlugRelatedField
-from rest_framework.serializers import (CharField, EmailField, ModelSerializer,
-                                        SerializerMethodField, ValidationError)
+from rest_framework.relations import ManyRelatedField, SlugRelatedField
+from rest_framework.serializers import (CharField, ChoiceField, EmailField,
+                                        FloatField, IntegerField, JSONField,
+                                        ModelSerializer, Serializer,
+                                        SerializerMethodField,
+                                        ValidationError)
 
 from reviews.models import Category, Comment, Genre, Review, Title, User
 
@@ -75,9 +79,7 @@ class MeSerializer(ModelSerializer):
                   'role',)
 
     def update(self, instance, validated_data):
-        user = get_object_or_404(User, username=instance)
-        print(user)
-        if user.role == 'user' and 'role' in validated_data:
+        if instance.role == 'user' and 'role' in validated_data:
             validated_data.pop('role')
         return super().update(instance, validated_data)
 
@@ -97,7 +99,8 @@ class ReviewSerializer(ModelSerializer):
         title = self.context['view'].kwargs['title_id']
         if (
             self.context['request'].method == 'POST'
-            and Review.objects.filter(author=author, title=title).exists()
+            and Review.objects.filter(author_id=author.pk,
+                                      title=title).exists()
         ):
             raise ValidationError(
                 'Вы уже оставляли отзыв к данному произведению!'
@@ -132,7 +135,7 @@ class GenreSerializer(ModelSerializer):
 
 class TitleSerializer(ModelSerializer):
     """Сериализатор списка произведений"""
-    rating = SerializerMethodField()
+    rating = FloatField(read_only=True)
     genre = GenreSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
 
@@ -141,17 +144,100 @@ class TitleSerializer(ModelSerializer):
         fields = ('id', 'name', 'year', 'rating', 'description', 'genre',
                   'category',)
 
-    def get_rating(self, obj):
-        return obj.reviews.all().aggregate(Avg('score'))['score__avg']
+
+class SlugListRelatedField(ManyRelatedField):
+    """
+    Список slug-ов, как SlugRelatedField(many=True), но объекты загружаются
+    одним запросом, а не запросом на каждый slug
+    """
+
+    def __init__(self, queryset, slug_field, **kwargs):
+        super().__init__(
+            child_relation=SlugRelatedField(queryset=queryset,
+                                            slug_field=slug_field),
+            **kwargs
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        slugs = [str(slug) for slug in data]
+        objects = {
+            str(getattr(obj, child.slug_field)): obj
+            for obj in child.get_queryset().filter(
+                **{f'{child.slug_field}__in': slugs}
+            )
+        }
+        missing = [slug for slug in slugs if slug not in objects]
+        if missing:
+            child.fail('does_not_exist', slug_name=child.slug_field,
+                       value=missing[0])
+        return [objects[slug] for slug in slugs]
 
 
 class TitleCreateSerializer(ModelSerializer):
     """Сериализатор для создания/обновления произведения"""
-    genre = SlugRelatedField(queryset=Genre.objects.all(),
-                             slug_field='slug', many=True)
+    genre = SlugListRelatedField(queryset=Genre.objects.all(),
+                                 slug_field='slug')
     category = SlugRelatedField(queryset=Category.objects.all(),
                                 slug_field='slug')
 
     class Meta:
         model = Title
         fields = ('id', 'name', 'year', 'description', 'genre', 'category',)
+
+
+class TitleSuggestQuerySerializer(Serializer):
+    """Параметры подсказок по началу названия произведения"""
+    prefix = CharField(max_length=256, trim_whitespace=False)
+    limit = IntegerField(min_value=1,
+                         max_value=settings.TITLE_SUGGEST_MAX_LIMIT,
+                         default=settings.TITLE_SUGGEST_LIMIT)
+
+
+class TitleExpandQuerySerializer(Serializer):
+    """Параметры встраивания отзывов и комментариев в произведение"""
+    REVIEWS = 'reviews'
+    COMMENTS = 'reviews.comments'
+
+    expand = CharField(required=False, default='')
+    reviews_limit = IntegerField(
+        min_value=1, max_value=settings.TITLE_EXPAND_REVIEWS_MAX_LIMIT,
+        default=settings.TITLE_EXPAND_REVIEWS_LIMIT
+    )
+    comments_limit = IntegerField(
+        min_value=1, max_value=settings.TITLE_EXPAND_COMMENTS_MAX_LIMIT,
+        default=settings.TITLE_EXPAND_COMMENTS_LIMIT
+    )
+
+    def validate_expand(self, value):
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names - {self.REVIEWS, self.COMMENTS}
+        if unknown:
+            raise ValidationError(
+                f'Неизвестные значения: {", ".join(sorted(unknown))}. '
+                f'Допустимые: {self.REVIEWS}, {self.COMMENTS}'
+            )
+        # Комментарии встраиваются в отзывы, поэтому требуют и их
+        if self.COMMENTS in names:
+            names.add(self.REVIEWS)
+        return names
+
+
+class BatchItemSerializer(Serializer):
+    """Вложенный запрос пакета /api/v1/batch/"""
+    method = ChoiceField(choices=list(settings.BATCH_METHOD_COSTS))
+    path = CharField()
+    body = JSONField(required=False, default=None)
+
+    def validate_path(self, value):
+        if not value.startswith(settings.BATCH_PATH_PREFIX):
+            raise ValidationError(
+                f'Путь должен начинаться с {settings.BATCH_PATH_PREFIX}'
+            )
+        if urlsplit(value).path == reverse('batch'):
+            raise ValidationError('Пакеты нельзя вкладывать друг в друга')
+        return value
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api import slow_queries
+from api.authentication import forget_token_version
+from reviews.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_token_version_cache(sender, instance, **kwargs):
+    """Сбрасывает закешированную версию токенов после изменения пользователя"""
+    transaction.on_commit(lambda: forget_token_version(instance.pk))
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    """Подключает журнал медленных запросов к каждому новому соединению"""
+    if settings.SLOW_QUERY_THRESHOLD_MS is not None:
+        slow_queries.install(connection)
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, NotSupportedError, transaction
+
+logger = logging.getLogger('api.slow_queries')
+# Обработчик по умолчанию, пересоздаётся при смене SLOW_QUERY_LOG
+file_handler = None
+
+# Длинные строковые параметры (тексты отзывов) обрезаются в журнале
+MAX_PARAM_LENGTH = 200
+
+current_request = ContextVar('slow_query_request', default=None)
+explaining = ContextVar('slow_query_explaining', default=False)
+
+STRING_LITERAL = re.compile(r"'(?:''|[^'])*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\?(?:, \?)+\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    SQL без значений: литералы и параметры заменяются на ?, списки
+    параметров IN (...) сворачиваются, чтобы одинаковые запросы
+    с разными значениями группировались вместе
+    """
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def loggable_params(params):
+    if params is None:
+        return None
+    result = []
+    for param in params:
+        if isinstance(param, str) and len(param) > MAX_PARAM_LENGTH:
+            param = param[:MAX_PARAM_LENGTH] + '...'
+        elif not isinstance(param, (int, float, bool, type(None), str)):
+            param = str(param)
+        result.append(param)
+    return result
+
+
+def originating_frame():
+    """
+    Ближайший к запросу кадр стека из кода проекта (views, filters,
+    serializers), а не из Django или DRF
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(settings.BASE_DIR) and filename != __file__:
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """
+    План выполнения запроса (EXPLAIN QUERY PLAN в SQLite, EXPLAIN в
+    PostgreSQL и MySQL); сам запрос не выполняется
+    """
+    try:
+        prefix = connection.ops.explain_query_prefix()
+    except NotSupportedError:
+        return None
+    token = explaining.set(True)
+    try:
+        # В PostgreSQL ошибка внутри транзакции прерывает её целиком,
+        # поэтому EXPLAIN выполняется в точке сохранения
+        if connection.in_atomic_block and connection.vendor == 'postgresql':
+            with transaction.atomic(using=connection.alias):
+                rows = run_explain(connection, f'{prefix} {sql}', params)
+        else:
+            rows = run_explain(connection, f'{prefix} {sql}', params)
+    except DatabaseError as error:
+        return [f'EXPLAIN не выполнен: {error}']
+    finally:
+        explaining.reset(token)
+    return [row[-1] if len(row) > 1 else row[0] for row in rows]
+
+
+def run_explain(connection, sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def get_logger():
+    """
+    Журнал медленных запросов. Если логгер api.slow_queries не настроен
+    в LOGGING, записи в формате JSON Lines пишутся в SLOW_QUERY_LOG
+    с ротацией по размеру
+    """
+    global file_handler
+    if logger.handlers and file_handler not in logger.handlers:
+        return logger
+    path = os.path.abspath(settings.SLOW_QUERY_LOG)
+    if file_handler is None or file_handler.baseFilename != path:
+        if file_handler is not None:
+            logger.removeHandler(file_handler)
+            file_handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(file_handler)
+        logger.setLevel(logging.WARNING)
+        logger.propagate = False
+    return logger
+
+
+def log_slow_query(connection, sql, params, many, duration):
+    normalized = normalize_sql(sql)
+    request = current_request.get()
+    match = getattr(request, 'resolver_match', None)
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'duration_ms': round(duration * 1000, 3),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'params': None if many else loggable_params(params),
+        'database': connection.alias,
+        'view': match.view_name if match is not None else None,
+        'method': request.method if request is not None else None,
+        'path': request.path if request is not None else None,
+        'frame': originating_frame(),
+        'plan': (explain(connection, sql, params)
+                 if settings.SLOW_QUERY_EXPLAIN and not many else None),
+    }
+    get_logger().warning(json.dumps(record, ensure_ascii=False))
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """execute_wrapper соединения: записывает запросы дольше порога"""
+    started = perf_counter()
+    result = execute(sql, params, many, context)
+    duration = perf_counter() - started
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if (threshold is not None and duration * 1000 >= threshold
+            and not explaining.get()):
+        log_slow_query(context['connection'], sql, params, many, duration)
+    return result
+
+
+def install(connection):
+    """Подключает журнал медленных запросов к новому соединению"""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+class SlowQueryRequestMiddleware:
+    """Запоминает текущий запрос, чтобы связать медленный SQL с view"""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+
+def read_log(path):
+    """Записи журнала вместе с файлами ротации, от старых к новым"""
+    paths = [path]
+    number = 1
+    while os.path.exists(f'{path}.{number}'):
+        paths.append(f'{path}.{number}')
+        number += 1
+    for log_path in reversed(paths):
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(records):
+    """
+    Группирует записи по отпечатку SQL: число, суммарное, среднее
+    и максимальное время, view и последний план выполнения
+    """
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'],
+            'sql': record['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'frames': set(),
+            'plan': None,
+            'last_seen': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        if record.get('view'):
+            group['views'].add(record['view'])
+        if record.get('frame'):
+            group['frames'].add(record['frame'])
+        if record.get('plan'):
+            group['plan'] = record['plan']
+        group['last_seen'] = record['time']
+    for group in groups.values():
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 3)
+        group['total_ms'] = round(group['total_ms'], 3)
+        group['views'] = sorted(group['views'])
+        group['frames'] = sorted(group['frames'])
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
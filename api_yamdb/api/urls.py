@@ -1,8 +1,9 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                       get_token, registrations, ReviewViewSet,
+from api.batch import BatchView
+from api.views import (CategoryViewSet, CommentViewSet, export,
+                       GenreViewSet, get_token, registrations, ReviewViewSet,
                        TitleViewSet, UserViewSet)
 
 router_v1 = DefaultRouter()
@@ -24,4 +25,6 @@ urlpatterns = [
     path('v1/', include(router_v1.urls)),
     path('v1/auth/signup/', registrations),
     path('v1/auth/token/', get_token),
+    path('v1/batch/', BatchView.as_view(), name='batch'),
+    re_path(r'^v1/export/(?P<resource>titles|reviews|comments)/$', export),
 ]
@@ -1,24 +1,43 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import caches
+from django.db import transaction
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from api.authentication import add_user_claims
+from api.conditional import (CachedListMixin, ConditionalListMixin,
+                             ConditionalRetrieveMixin)
 from api.custom_viewsets import (ListCreateDestroyViewSet,
                                  RetrieveListCreateDestroyPartialUpdateViewSet)
-from api.filters import TitleFilter
+from api.export import export_response
+from api.fieldsets import SparseFieldsetMixin
+from api.filters import CatalogFilterBackend, TitleFilter
+from api.metrics import TimedSerializerViewMixin
 from api.permissions import (IsAdmin, IsModerator, IsOwner, IsSuperuser,
                              ReadOnly)
+from api.projections import (CommentProjection, ProjectedReadMixin,
+                             ReviewProjection, TitleProjection,
+                             expand_reviews)
+from api.query_budget import QueryBudgetMixin
+from api.renderers import CompactJSONRenderer
 from api.serializers import (CategorySerializer, CommentSerializer,
                              GenreSerializer, GetTokenSerializer, MeSerializer,
                              RegistrationsSerializer, ReviewSerializer,
-                             TitleCreateSerializer, TitleSerializer,
-                             UserSerializer)
+                             TitleCreateSerializer,
+                             TitleExpandQuerySerializer, TitleSerializer,
+                             TitleSuggestQuerySerializer, UserSerializer)
 from reviews.models import Category, Genre, Review, Title, User
+from reviews import versions
+from reviews.bitmaps import title_bitmap_index
+from reviews.outbox import enqueue_email
+from reviews.search import get_search_backend
+from reviews.suggest import title_suggest_index
 
 
 @api_view(['POST'])
@@ -32,16 +51,16 @@ def registrations(request):
     serializer.is_valid(raise_exception=True)
     email = serializer.data['email']
     username = serializer.data['username']
-    user, _ = User.objects.get_or_create(email=email, username=username)
-    token = default_token_generator.make_token(user)
-    send_mail(
-        'Ваш confirmation_code',
-        f'Для пользователя {username} выпущен '
-        f'confirmation_code: {token}',
-        settings.EMAIL_SENDER,
-        [f'{email}'],
-        fail_silently=False,
-    )
+    # Письмо только ставится в очередь, отправляет его run_mail_worker
+    with transaction.atomic():
+        user, _ = User.objects.get_or_create(email=email, username=username)
+        token = default_token_generator.make_token(user)
+        enqueue_email(
+            'Ваш confirmation_code',
+            f'Для пользователя {username} выпущен '
+            f'confirmation_code: {token}',
+            email,
+        )
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -63,35 +82,54 @@ def get_token(request):
         user,
         confirmation_code
     ):
-        refresh = RefreshToken.for_user(user)
+        refresh = add_user_claims(RefreshToken.for_user(user), user)
         return Response(
             {'access': str(refresh.access_token)},
-            status=status
+            status=status.HTTP_200_OK
         )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAdmin | IsSuperuser])
+def export(request, resource):
+    """
+    View-функция потоковой выгрузки произведений, отзывов и комментариев
+    в NDJSON (?output=ndjson) или CSV (?output=csv). Поддерживает фильтры
+    TitleFilter и инкрементальную выгрузку через ?since_id= и ?since=
+    """
+    return export_response(request, resource)
+
+
+class UserViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                  SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet модели кастомного пользователя"""
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = [IsAdmin | IsSuperuser]
     lookup_field = 'username'
+    max_queries = 4
+    # Удаление пользователя каскадно удаляет его отзывы и комментарии
+    # с сигналами по каждому объекту: число запросов растёт с их числом
+    action_max_queries = {'destroy': None}
 
     @action(
         detail=False,
         methods=['get', 'patch'],
         url_path='me',
-        permission_classes=[permissions.IsAuthenticated, ]
+        permission_classes=[permissions.IsAuthenticated, ],
+        serializer_class=MeSerializer
     )
     def me_endpoint(self, request):
-        user = request.user
-        user = get_object_or_404(User, username=user.username)
+        # request.user может быть лёгким пользователем из токена,
+        # полные данные профиля загружаются по первичному ключу
+        user = get_object_or_404(User, pk=request.user.pk)
         if request.method == 'GET':
-            serializer = MeSerializer(user)
+            serializer = self.get_serializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         if request.method == 'PATCH':
-            serializer = MeSerializer(user, data=request.data, partial=True)
+            serializer = self.get_serializer(user, data=request.data,
+                                             partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -101,20 +139,32 @@ class UserViewSet(viewsets.ModelViewSet):
         )
 
 
-class ReviewViewSet(RetrieveListCreateDestroyPartialUpdateViewSet):
+class ReviewViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                    ConditionalListMixin, ConditionalRetrieveMixin,
+                    ProjectedReadMixin,
+                    RetrieveListCreateDestroyPartialUpdateViewSet):
     """
     ViewSet модели Review. Позволяет работать с постами.
     Имеет функции: CRUD
     """
     serializer_class = ReviewSerializer
+    projection_class = ReviewProjection
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly,
         (ReadOnly | IsAdmin | IsModerator | IsOwner)
     ]
+    max_queries = 6
+    # Удаление отзыва каскадно удаляет комментарии
+    action_max_queries = {'create': 10, 'partial_update': 10,
+                          'destroy': None}
+
+    def get_version_keys(self):
+        return [versions.reviews_key(self.kwargs['title_id']),
+                versions.AUTHORS]
 
     def perform_create(self, serializer):
         title = get_object_or_404(Title, id=self.kwargs['title_id'])
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(author_id=self.request.user.pk, title=title)
 
     def get_queryset(self):
         # Добавил условие, чтобы в консоли не отображалась ошибка при
@@ -122,24 +172,41 @@ class ReviewViewSet(RetrieveListCreateDestroyPartialUpdateViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return Title.objects.none()
         title = get_object_or_404(Title, id=self.kwargs['title_id'])
-        return title.reviews.all()
+        # Имя автора выводится в каждом отзыве
+        queryset = title.reviews.select_related('author')
+        query = self.request.query_params.get('q')
+        if query:
+            # Полнотекстовый поиск по тексту отзывов с сортировкой
+            # по релевантности
+            queryset = get_search_backend().filter_reviews(queryset, query)
+        return queryset
 
 
-class CommentViewSet(RetrieveListCreateDestroyPartialUpdateViewSet):
+class CommentViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                     ConditionalListMixin, ConditionalRetrieveMixin,
+                     ProjectedReadMixin,
+                     RetrieveListCreateDestroyPartialUpdateViewSet):
     """
     ViewSet модели Comment. Позволяет работать с комментариями пользователей.
     Имеет функции: CRUD
     """
     serializer_class = CommentSerializer
+    projection_class = CommentProjection
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly,
         (ReadOnly | IsAdmin | IsModerator | IsOwner)
     ]
+    max_queries = 6
+    action_max_queries = {'create': 10, 'partial_update': 8, 'destroy': 8}
+
+    def get_version_keys(self):
+        return [versions.comments_key(self.kwargs['review_id']),
+                versions.AUTHORS]
 
     def perform_create(self, serializer):
         review = get_object_or_404(Review, title_id=self.kwargs['title_id'],
                                    id=self.kwargs['review_id'])
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author_id=self.request.user.pk, review=review)
 
     def get_queryset(self):
         # Добавил условие, чтобы в консоли не отображалась ошибка при
@@ -150,10 +217,12 @@ class CommentViewSet(RetrieveListCreateDestroyPartialUpdateViewSet):
             Review, title_id=self.kwargs['title_id'],
             id=self.kwargs['review_id'],
         )
-        return review.comments.all()
+        return review.comments.select_related('author')
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+class CategoryViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                      ConditionalListMixin, CachedListMixin,
+                      SparseFieldsetMixin, ListCreateDestroyViewSet):
     """
     ViewSet предназначен для просмотра списка категорий (типы)
     произведений, создания и удаления категории
@@ -164,9 +233,16 @@ class CategoryViewSet(ListCreateDestroyViewSet):
     search_fields = ('name',)
     lookup_field = 'slug'
     permission_classes = [IsAdmin | IsSuperuser | ReadOnly]
+    max_queries = 4
+    action_max_queries = {'create': 9, 'destroy': 8}
+
+    def get_version_keys(self):
+        return [versions.CATEGORIES]
 
 
-class GenreViewSet(ListCreateDestroyViewSet):
+class GenreViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                   ConditionalListMixin, CachedListMixin,
+                   SparseFieldsetMixin, ListCreateDestroyViewSet):
     """
     ViewSet предназначен для просмотра списка категорий жанров, создания и
     удаления жанра
@@ -177,21 +253,181 @@ class GenreViewSet(ListCreateDestroyViewSet):
     search_fields = ('name',)
     permission_classes = [IsAdmin | IsSuperuser | ReadOnly]
     lookup_field = 'slug'
+    max_queries = 4
+    action_max_queries = {'create': 9, 'destroy': 8}
 
+    def get_version_keys(self):
+        return [versions.GENRES]
 
-class TitleViewSet(RetrieveListCreateDestroyPartialUpdateViewSet):
+
+class TitleViewSet(QueryBudgetMixin, TimedSerializerViewMixin,
+                   ConditionalListMixin, ConditionalRetrieveMixin,
+                   ProjectedReadMixin,
+                   RetrieveListCreateDestroyPartialUpdateViewSet):
     """
     ViewSet предоставляет CRUD действия с произведения, к которым пишут
     отзывы (определённый фильм, книга или песенка).
     """
-    queryset = Title.objects.all()
+    # Категория подтягивается JOIN-ом, жанры одним запросом на страницу,
+    # рейтинг вычисляется в SQL (см. get_queryset)
+    queryset = (Title.objects.select_related('category')
+                .prefetch_related('genre'))
     serializer_class = TitleSerializer
-    filter_backends = (DjangoFilterBackend,)
+    # list и retrieve читают только колонки ответа, без сериализатора
+    projection_class = TitleProjection
+    # ?format=compact: жанры и категории один раз на страницу в included
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES,
+                        CompactJSONRenderer)
+    filter_backends = (CatalogFilterBackend,)
     filterset_class = TitleFilter
     permission_classes = [IsAdmin | IsSuperuser | ReadOnly]
+    # retrieve с ?expand=reviews.comments - 7 запросов, фасеты с
+    # построением индекса жанров - 6
+    max_queries = 8
+    # list с построением индекса жанров - 9 запросов (без него - 5);
+    # create - 17 при любом числе жанров; partial_update - 23, если меняет
+    # жанры, категорию и создаёт версии произведения. Удаление каскадно
+    # удаляет отзывы и комментарии с сигналами по каждому объекту:
+    # бюджет рассчитан на произведение с ~150 комментариями (test_26)
+    action_max_queries = {'list': 10, 'create': 18, 'partial_update': 24,
+                          'destroy': 200}
+
+    def get_version_keys(self):
+        if self.action == 'retrieve':
+            keys = [versions.title_key(self.kwargs['pk']),
+                    versions.GENRES, versions.CATEGORIES]
+            expand = self.get_expansion()['expand']
+            if TitleExpandQuerySerializer.REVIEWS in expand:
+                keys += [versions.reviews_key(self.kwargs['pk']),
+                         versions.AUTHORS]
+            if TitleExpandQuerySerializer.COMMENTS in expand:
+                keys += map(versions.comments_key,
+                            self.get_expanded_review_ids())
+            return keys
+        if self.action == 'facets':
+            # Рейтинги не входят в версию каталога: они меняются с каждым
+            # отзывом и нужны, только если по ним фильтруют
+            params = self.request.query_params
+            if 'rating_min' in params or 'rating_max' in params:
+                return [versions.CATALOG, versions.TITLES]
+            return [versions.CATALOG]
+        if self.action == 'list':
+            # По версии каталога сверяется индекс фильтров в памяти
+            return [versions.TITLES, versions.CATALOG]
+        return [versions.TITLES]
+
+    def get_catalog_version(self):
+        """
+        Версия каталога из версий ETag этого запроса; None, если ответ
+        от неё не зависит
+        """
+        if versions.CATALOG not in self.get_version_keys():
+            return None
+        resource_versions = dict(self.get_resource_versions())
+        return {key: resource_versions[key]
+                for key in (versions.GLOBAL, versions.CATALOG)}
+
+    def get_expansion(self):
+        """Параметры ?expand= для retrieve; проверяются один раз за запрос"""
+        if getattr(self, '_expansion', None) is None:
+            query = TitleExpandQuerySerializer(data=self.request.query_params)
+            query.is_valid(raise_exception=True)
+            self._expansion = query.validated_data
+        return self._expansion
+
+    def get_expanded_review_ids(self):
+        """Id встраиваемых отзывов: первые reviews_limit в порядке списка"""
+        if getattr(self, '_expanded_review_ids', None) is None:
+            pk = str(self.kwargs['pk'])
+            self._expanded_review_ids = list(
+                Review.objects.filter(title_id=pk).order_by('-id')
+                .values_list('id', flat=True)
+                [:self.get_expansion()['reviews_limit']]
+            ) if pk.isdigit() else []
+        return self._expanded_review_ids
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Произведение; с ?expand=reviews - вместе с первыми reviews_limit
+        отзывами, с ?expand=reviews.comments - и с comments_limit
+        последними комментариями к каждому из них. Число запросов к БД
+        не зависит от лимитов
+        """
+        response = super().retrieve(request, *args, **kwargs)
+        expansion = self.get_expansion()
+        if (response.status_code != status.HTTP_200_OK
+                or TitleExpandQuerySerializer.REVIEWS
+                not in expansion['expand']):
+            return response
+        comments_limit = (
+            expansion['comments_limit']
+            if TitleExpandQuerySerializer.COMMENTS in expansion['expand']
+            else None
+        )
+        response.data = {**response.data, 'reviews': expand_reviews(
+            self.get_expanded_review_ids(), comments_limit
+        )}
+        return response
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        # Рейтинг не вычисляется, если его нет в ответе (?fields=, ?omit=)
+        # и по нему не фильтруют и не сортируют
+        params = self.request.query_params
+        if (self.is_field_requested('rating')
+                or 'rating_min' in params or 'rating_max' in params
+                or 'rating' in params.get('ordering', '')):
+            queryset = queryset.with_rating()
+        return queryset
 
     def get_serializer_class(self):
         # в зависимости от действия выбираем тот или иной сериалайзер
         if self.request.method in ['POST', 'PATCH']:
             return TitleCreateSerializer
         return TitleSerializer
+
+    @action(detail=False, methods=['get'], pagination_class=None,
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES)
+    def suggest(self, request):
+        """
+        Подсказки для строки поиска: произведения, название которых
+        начинается с ?prefix=, из индекса в памяти без запросов к БД
+        """
+        query = TitleSuggestQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(title_suggest_index.suggest(
+            query.validated_data['prefix'], query.validated_data['limit']
+        ))
+
+    @action(detail=False, methods=['get'], pagination_class=None,
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES)
+    def facets(self, request):
+        """
+        Счётчики произведений по жанрам, категориям и десятилетиям среди
+        произведений, подходящих под фильтры списка (те же параметры, что
+        и у /titles/). Ответ кешируется по версии каталога
+        """
+        return self.conditional_response(self.facet_counts, request)
+
+    def facet_counts(self, request):
+        cache = caches[settings.CATALOG_CACHE_ALIAS]
+        key = f'facets:titles:{self.get_request_fingerprint(request)}'
+        data = cache.get(key)
+        if data is None:
+            catalog_version = self.get_catalog_version()
+            filterset = TitleFilter(request.query_params,
+                                    queryset=Title.objects.with_rating(),
+                                    request=request,
+                                    catalog_version=catalog_version)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            data, built_version = title_bitmap_index.facet_counts(
+                filterset.result_bitmap(), catalog_version
+            )
+            # Индекс новее версий ключа (его обновила запись этого
+            # процесса): счётчики не кешируются под старым ключом
+            if built_version == catalog_version:
+                cache.set(key, data)
+        return Response(data)
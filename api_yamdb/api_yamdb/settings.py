@@ -38,13 +38,23 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'reviews.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.OptionalCursorPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
+    ],
+    # JSON через orjson (без него - стандартный json)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -54,7 +64,112 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Версия токенов пользователя проверяется на каждом запросе. Без кеша это
+# один запрос по первичному ключу; с общим кешем (Redis, Memcached),
+# указанным здесь по имени из CACHES, проверка обходится без БД
+TOKEN_VERSION_CACHE_ALIAS = None
+TOKEN_VERSION_CACHE_TIMEOUT = 300
+
+# Кеши. Для нескольких процессов/серверов кеш каталога (категории и
+# жанры) можно вынести в общий бэкенд через переменные окружения
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.getenv(
+            'CATALOG_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': 600,
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# Полнотекстовый поиск (?q=). None - FTS5 для SQLite, LIKE для остальных
+# СУБД; можно указать свой класс-наследник reviews.search.BaseSearchBackend
+FULL_TEXT_SEARCH_BACKEND = None
+
+# Индексы каталога в памяти процесса сверяются с версией каталога: фильтры
+# списка произведений и фасеты - в каждом запросе (с версией для ETag),
+# подсказки - не чаще чем раз в указанное число секунд
+CATALOG_INDEX_REFRESH_INTERVAL = 60
+
+# Подсказки по началу названия (/titles/suggest/)
+TITLE_SUGGEST_LIMIT = 10
+TITLE_SUGGEST_MAX_LIMIT = 50
+
+# Отзывы и комментарии, встроенные в произведение
+# (/titles/{id}/?expand=reviews,reviews.comments)
+TITLE_EXPAND_REVIEWS_LIMIT = 10
+TITLE_EXPAND_REVIEWS_MAX_LIMIT = 50
+TITLE_EXPAND_COMMENTS_LIMIT = 3
+TITLE_EXPAND_COMMENTS_MAX_LIMIT = 20
+
+# Версии ресурсов для ETag. Без кеша (по умолчанию) и ответ 304, и попадание
+# в кеш списка выполняют один запрос к БД за версиями; имя кеша из CACHES
+# убирает и его, но кеш должен быть общим для всех процессов: в LocMemCache
+# не видны версии, увеличенные другими процессами
+RESOURCE_VERSION_CACHE_ALIAS = None
+
+# Метрики запросов по маршрутам в формате Prometheus (/metrics). Выключены
+# по умолчанию: /metrics открывает маршруты и нагрузку, поэтому включаются
+# явно, вместе с METRICS_TOKEN - тогда /metrics требует заголовок
+# Authorization: Bearer <токен>
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Профилирование отдельного запроса администратором по заголовку
+# X-Profile: cprofile | sample. Профили сохраняются в PROFILING_DIR
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+# Интервал сэмплирования стека в режиме sample, секунды
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+# Журнал медленных запросов к БД (manage.py slow_query_report): запросы
+# дольше порога записываются с планом выполнения в SLOW_QUERY_LOG.
+# None отключает журнал (в переменной окружения - пустая строка или off)
+_slow_query_threshold = os.getenv('SLOW_QUERY_THRESHOLD_MS', '200').strip()
+SLOW_QUERY_THRESHOLD_MS = (
+    None if _slow_query_threshold.lower() in ('', 'off')
+    else float(_slow_query_threshold)
+)
+del _slow_query_threshold
+SLOW_QUERY_EXPLAIN = True
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG',
+                           os.path.join(BASE_DIR, 'logs', 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 5
+
+# Бюджеты запросов к БД для ViewSet (api.query_budget.QueryBudgetMixin)
+# и поиск N+1: одинаковый SQL, выполненный QUERY_REPEAT_LIMIT раз за
+# запрос. Нарушения пишутся в журнал api.query_budget, а с
+# QUERY_BUDGET_RAISE = True (включено в тестах) вызывают исключение
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_RAISE = False
+QUERY_REPEAT_LIMIT = 5
+
+# Пакетные запросы (/api/v1/batch/): число вложенных запросов, их
+# суммарная стоимость по методам и потоки для параллельных GET-запросов
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_COST = 40
+BATCH_METHOD_COSTS = {'GET': 1, 'HEAD': 1, 'OPTIONS': 1, 'POST': 5,
+                      'PUT': 5, 'PATCH': 5, 'DELETE': 5}
+BATCH_PATH_PREFIX = '/api/v1/'
+BATCH_WORKERS = 4
+
+# list и retrieve произведений, отзывов и комментариев собирают ответ из
+# .values() без сериализаторов (api.projections); False - через сериализаторы
+READ_PROJECTIONS_ENABLED = (
+    os.getenv('READ_PROJECTIONS_ENABLED', 'true').lower() == 'true'
+)
+
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.slow_queries.SlowQueryRequestMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -137,3 +252,14 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static/'),)
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 EMAIL_SENDER = 'from@example.com'
+
+# Очередь исходящих писем (manage.py run_mail_worker)
+
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# Базовая и максимальная задержка повторной отправки, секунды
+EMAIL_OUTBOX_RETRY_DELAY = 30
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+# На сколько секунд обработчик резервирует взятые письма
+EMAIL_OUTBOX_LEASE = 300
+EMAIL_OUTBOX_POLL_INTERVAL = 5
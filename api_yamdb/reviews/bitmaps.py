@@ -0,0 +1,258 @@
+import json
+
+from django.db import connection
+
+from reviews.memory_index import CatalogMemoryIndex
+from reviews.models import Category, Genre, Title
+
+BITMAP_BUILD_CHUNK_SIZE = 5000
+
+ANY = 'any'
+ALL = 'all'
+GENRE_MODES = (ANY, ALL)
+
+# Номера установленных битов для каждого значения байта
+BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)
+)
+
+
+def popcount(bitmap):
+    if hasattr(bitmap, 'bit_count'):
+        # Python 3.10+
+        return bitmap.bit_count()
+    return bin(bitmap).count('1')
+
+
+def ids_bitmap(ids):
+    """
+    Битовая карта (int, бит N - произведение с id N) по списку id. Собирается
+    через bytearray: установка битов по одному в int стоила бы O(n) на бит
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        data[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(data, 'little')
+
+
+def bitmap_ids(bitmap):
+    """Возрастающий список id по битовой карте"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    ids = []
+    for index, byte in enumerate(data):
+        if byte:
+            base = index * 8
+            ids.extend(base + bit for bit in BYTE_BITS[byte])
+    return ids
+
+
+def filter_bitmap(queryset, bitmap):
+    """
+    Ограничивает QuerySet произведениями из битовой карты. В SQLite список
+    id передаётся одним JSON-параметром, чтобы не упереться в лимит
+    числа параметров запроса
+    """
+    if not bitmap:
+        return queryset.none()
+    ids = bitmap_ids(bitmap)
+    if connection.vendor == 'sqlite':
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[f'"{table}"."id" IN (SELECT value FROM json_each(%s))'],
+            params=[json.dumps(ids)]
+        )
+    return queryset.filter(id__in=ids)
+
+
+def decade_of(year):
+    return year // 10 * 10
+
+
+def _set_bit(mapping, key, pk):
+    mapping[key] = mapping.get(key, 0) | 1 << pk
+
+
+def _discard_bit(mapping, pk, keys=None):
+    bit = 1 << pk
+    for key in mapping if keys is None else keys:
+        bitmap = mapping.get(key, 0)
+        if bitmap & bit:
+            mapping[key] = bitmap ^ bit
+
+
+class TitleBitmapIndex(CatalogMemoryIndex):
+    """
+    Битовые карты произведений по жанрам, категориям и годам. Фильтр
+    по нескольким жанрам (любой или все), категории, году и десятилетию
+    сводится к побитовым операциям над int без JOIN-ов в SQL, а счётчики
+    для фасетов текущей выборки - к подсчёту единичных битов
+    """
+
+    def _empty(self):
+        return {
+            '_all': 0,
+            # id жанра/категории -> битовая карта; год -> битовая карта
+            '_genres': {},
+            '_categories': {},
+            '_years': {},
+            # slug -> id
+            '_genre_ids': {},
+            '_category_ids': {},
+        }
+
+    def _load(self):
+        genre_ids = dict(Genre.objects.values_list('slug', 'id'))
+        category_ids = dict(Category.objects.values_list('slug', 'id'))
+        titles, categories, years = [], {}, {}
+        rows = (Title.objects.order_by()
+                .values_list('id', 'category_id', 'year')
+                .iterator(chunk_size=BITMAP_BUILD_CHUNK_SIZE))
+        for pk, category_id, year in rows:
+            titles.append(pk)
+            categories.setdefault(category_id, []).append(pk)
+            years.setdefault(year, []).append(pk)
+        genres = {genre_id: [] for genre_id in genre_ids.values()}
+        links = (Title.genre.through.objects.order_by()
+                 .values_list('title_id', 'genre_id')
+                 .iterator(chunk_size=BITMAP_BUILD_CHUNK_SIZE))
+        for title_id, genre_id in links:
+            genres.setdefault(genre_id, []).append(title_id)
+        return {
+            '_all': ids_bitmap(titles),
+            '_genres': {key: ids_bitmap(ids) for key, ids in genres.items()},
+            '_categories': {key: ids_bitmap(ids)
+                            for key, ids in categories.items()},
+            '_years': {key: ids_bitmap(ids) for key, ids in years.items()},
+            '_genre_ids': genre_ids,
+            '_category_ids': category_ids,
+        }
+
+    def update_title(self, pk, category_id, year):
+        """Добавляет произведение или обновляет его категорию и год"""
+        with self._lock:
+            if not self._built:
+                return
+            _discard_bit(self._categories, pk)
+            _discard_bit(self._years, pk)
+            self._all |= 1 << pk
+            _set_bit(self._categories, category_id, pk)
+            _set_bit(self._years, year, pk)
+
+    def remove_title(self, pk):
+        with self._lock:
+            if not self._built:
+                return
+            for mapping in (self._genres, self._categories, self._years):
+                _discard_bit(mapping, pk)
+            self._all &= ~(1 << pk)
+
+    def add_genres(self, pk, genre_ids):
+        with self._lock:
+            if self._built:
+                for genre_id in genre_ids:
+                    _set_bit(self._genres, genre_id, pk)
+
+    def remove_genres(self, pk, genre_ids=None):
+        """Убирает у произведения указанные жанры (None - все)"""
+        with self._lock:
+            if self._built:
+                _discard_bit(self._genres, pk, genre_ids)
+
+    def add_titles_to_genre(self, genre_id, title_ids):
+        with self._lock:
+            if self._built:
+                self._genres[genre_id] = (self._genres.get(genre_id, 0)
+                                          | ids_bitmap(title_ids))
+
+    def remove_titles_from_genre(self, genre_id, title_ids=None):
+        """Убирает из жанра указанные произведения (None - все)"""
+        with self._lock:
+            if not self._built:
+                return
+            if title_ids is None:
+                self._genres[genre_id] = 0
+            else:
+                self._genres[genre_id] = (self._genres.get(genre_id, 0)
+                                          & ~ids_bitmap(title_ids))
+
+    def _genre_bitmap(self, slugs, mode):
+        bitmaps = [self._genres.get(self._genre_ids.get(slug), 0)
+                   for slug in slugs]
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if mode == ALL else result | bitmap
+        return result
+
+    def _decade_bitmap(self, decade):
+        result = 0
+        for year, bitmap in self._years.items():
+            if decade_of(year) == decade:
+                result |= bitmap
+        return result
+
+    def select(self, genres=None, mode=ANY, category=None, year=None,
+               decade=None, version=None):
+        """
+        Битовая карта произведений с жанрами genres (любым из них или всеми,
+        в зависимости от mode), категорией category, годом year и десятилетием
+        decade. None, если ни одно условие не задано. Неизвестные slug-и
+        ничему не соответствуют. Индекс не старше версии каталога version
+        (см. CatalogMemoryIndex._refresh)
+        """
+        if not genres and category is None and year is None and (
+                decade is None):
+            return None
+        self._refresh(version)
+        with self._lock:
+            result = self._all
+            if genres:
+                result &= self._genre_bitmap(genres, mode)
+            if category is not None:
+                result &= self._categories.get(
+                    self._category_ids.get(category), 0
+                )
+            if year is not None:
+                result &= self._years.get(year, 0)
+            if decade is not None:
+                result &= self._decade_bitmap(decade)
+        return result
+
+    def facet_counts(self, bitmap=None, version=None):
+        """
+        Число произведений по жанрам, категориям и десятилетиям среди
+        произведений из bitmap (None - во всём каталоге): один проход
+        по битовым картам без запросов к БД. Возвращает счётчики и версию
+        каталога, по которой построен индекс (не старше version)
+        """
+        self._refresh(version)
+        with self._lock:
+            built_version = self._version
+            if bitmap is None:
+                bitmap = self._all
+            genres = {
+                slug: popcount(self._genres.get(genre_id, 0) & bitmap)
+                for slug, genre_id in sorted(self._genre_ids.items())
+            }
+            categories = {
+                slug: popcount(self._categories.get(category_id, 0) & bitmap)
+                for slug, category_id in sorted(self._category_ids.items())
+            }
+            decades = {}
+            for year, year_bitmap in self._years.items():
+                if not year_bitmap:
+                    continue
+                decade = decade_of(year)
+                decades[decade] = (decades.get(decade, 0)
+                                   + popcount(year_bitmap & bitmap))
+        return {
+            'genre': genres,
+            'category': categories,
+            'decade': {str(decade): decades[decade]
+                       for decade in sorted(decades)},
+        }, built_version
+
+
+title_bitmap_index = TitleBitmapIndex()
@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.db import connection
+
+
+@contextmanager
+def keep_imported_dates(*models):
+    """
+    Отключает auto_now_add на время загрузки, чтобы bulk_create
+    сохранял переданные даты публикации, а не текущее время
+    """
+    fields = [field for model in models
+              for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_insert(model, objs, ignore_conflicts=False):
+    """
+    bulk_create пачки объектов. Размер одного INSERT Django выбирает сам
+    по ограничениям СУБД: явный batch_size в Django 2.2 не сверяется
+    с лимитом SQLite на число строк в одном запросе
+    """
+    model.objects.bulk_create(objs, ignore_conflicts=ignore_conflicts)
+
+
+def delete_all_rows(model):
+    """
+    Удаляет все строки таблицы одним DELETE, без загрузки объектов
+    в память, каскадов и сигналов на каждую строку
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+
+
+def reset_sequences(models):
+    """
+    Сдвигает счётчики автоинкремента (PostgreSQL) за максимальный id после
+    вставки строк с явными id
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,337 @@
+import random
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import Pool
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from reviews import versions
+from reviews.bulk import bulk_insert, keep_imported_dates, reset_sequences
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+DEFAULT_CHUNK_SIZE = 10000
+# Произведения генерируются пачками: одна пачка - одна задача для
+# процесса-генератора и одна транзакция записи
+TITLES_PER_TASK = 500
+
+FIXED = 'fixed'
+UNIFORM = 'uniform'
+ZIPF = 'zipf'
+
+WORDS = (
+    'ветер', 'город', 'ночь', 'море', 'тень', 'свет', 'дорога', 'сон',
+    'время', 'память', 'зеркало', 'огонь', 'лес', 'песня', 'звезда',
+    'остров', 'письмо', 'сердце', 'зима', 'лето', 'дом', 'река', 'небо',
+    'тишина', 'история', 'последний', 'тайный', 'долгий', 'красный',
+    'северный', 'потерянный', 'старый', 'новый', 'далёкий', 'белый',
+)
+# Оценки смещены к высоким, как в реальных отзывах
+SCORE_WEIGHTS = (1, 1, 2, 3, 4, 6, 9, 11, 9, 6)
+DATES_RANGE_DAYS = 5 * 365
+
+
+@lru_cache(maxsize=16)
+def zipf_cum_weights(size, exponent):
+    """Накопленные веса закона Ципфа для random.choices"""
+    return tuple(accumulate(rank ** -exponent
+                            for rank in range(1, size + 1)))
+
+
+class Distribution:
+    """
+    Распределение целых чисел, заданное строкой: N - всегда N,
+    uniform:A:B - равномерно от A до B, zipf:S:MAX - от 1 до MAX
+    с вероятностью k^-S (мало у большинства, много у немногих)
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        name, *params = spec.split(':')
+        try:
+            if not params:
+                self.kind, self.value = FIXED, int(name)
+                valid = self.value >= 0
+            elif name == UNIFORM and len(params) == 2:
+                self.kind = UNIFORM
+                self.low, self.high = map(int, params)
+                valid = 0 <= self.low <= self.high
+            elif name == ZIPF and len(params) == 2:
+                self.kind = ZIPF
+                exponent, maximum = float(params[0]), int(params[1])
+                valid = exponent > 0 and maximum >= 1
+                self.cum_weights = zipf_cum_weights(maximum, exponent)
+                self.values = range(1, maximum + 1)
+            else:
+                valid = False
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(
+                f'Неверное распределение {spec!r}: ожидается N, '
+                'uniform:A:B или zipf:S:MAX'
+            )
+
+    def sample(self, rng):
+        if self.kind == FIXED:
+            return self.value
+        if self.kind == UNIFORM:
+            return rng.randint(self.low, self.high)
+        return rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+    def __repr__(self):
+        return self.spec
+
+
+def sample_distinct(rng, size, cum_weights, count):
+    """
+    count различных номеров из range(size) с весами популярности. Если
+    нужна большая часть множества, веса не учитываются
+    """
+    if count * 2 > size:
+        return rng.sample(range(size), count)
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(range(size), cum_weights=cum_weights,
+                                  k=count - len(chosen)))
+    return list(chosen)
+
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def generate_task(task):
+    """
+    Данные одной пачки произведений без обращения к БД (выполняется
+    в отдельном процессе). Авторы, жанры и категории - номера в списках
+    id, даты - смещения в секундах назад от момента генерации
+    """
+    (number, titles_count, options) = task
+    rng = random.Random(f'{options["seed"]}:{number}')
+    users = options['users']
+    author_weights = zipf_cum_weights(users, options['author_skew'])
+    genre_weights = zipf_cum_weights(options['genres'], 1.0)
+    category_weights = zipf_cum_weights(options['categories'], 1.0)
+    this_year = options['this_year']
+    titles = []
+    for _ in range(titles_count):
+        reviews = []
+        reviews_count = min(options['reviews_per_title'].sample(rng), users)
+        for author in sample_distinct(rng, users, author_weights,
+                                      reviews_count):
+            age = rng.randint(0, DATES_RANGE_DAYS * 86400)
+            comments = [
+                (rng.choices(range(users), cum_weights=author_weights)[0],
+                 words(rng, rng.randint(3, 12)), rng.randint(0, age))
+                for _ in range(options['comments_per_review'].sample(rng))
+            ]
+            score = rng.choices(range(1, 11), weights=SCORE_WEIGHTS)[0]
+            reviews.append((author, score, words(rng, rng.randint(5, 30)),
+                            age, comments))
+        genres_count = min(rng.randint(1, 3), options['genres'])
+        titles.append({
+            'name': words(rng, rng.randint(1, 4)).capitalize(),
+            'year': this_year - min(int(rng.expovariate(1 / 15)), 120),
+            'description': words(rng, rng.randint(10, 40)),
+            'category': rng.choices(range(options['categories']),
+                                    cum_weights=category_weights)[0],
+            'genres': sample_distinct(rng, options['genres'], genre_weights,
+                                      genres_count),
+            'reviews': reviews,
+        })
+    return titles
+
+
+def write_objects(model, objs, chunk_size):
+    for start in range(0, len(objs), chunk_size):
+        bulk_insert(model, objs[start:start + chunk_size])
+
+
+def write_titles(titles, options, next_ids=None):
+    """
+    Записывает пачку сгенерированных произведений с отзывами
+    и комментариями в одной транзакции. next_ids - следующие свободные id
+    произведений и отзывов (обновляются на месте); без них id новых строк
+    возвращает СУБД. Возвращает число записанных произведений, отзывов
+    и комментариев
+    """
+    now, chunk_size = options['now'], options['chunk_size']
+    first_user_id = options['first_user_id']
+    title_objs = []
+    for data in titles:
+        scores = [review[1] for review in data['reviews']]
+        title_objs.append(Title(
+            name=data['name'], year=data['year'],
+            description=data['description'],
+            category_id=options['category_ids'][data['category']],
+            # агрегаты оценок известны заранее, пересчёт не нужен
+            score_sum=sum(scores), score_count=len(scores),
+        ))
+        if next_ids is not None:
+            title_objs[-1].id = next_ids[Title]
+            next_ids[Title] += 1
+    with transaction.atomic():
+        write_objects(Title, title_objs, chunk_size)
+        links, review_objs, review_comments = [], [], []
+        for title, data in zip(title_objs, titles):
+            links.extend(
+                Title.genre.through(title_id=title.id,
+                                    genre_id=options['genre_ids'][genre])
+                for genre in data['genres']
+            )
+            for author, score, text, age, comments in data['reviews']:
+                review = Review(title_id=title.id,
+                                author_id=first_user_id + author,
+                                text=text, score=score,
+                                pub_date=now - timedelta(seconds=age))
+                if next_ids is not None:
+                    review.id = next_ids[Review]
+                    next_ids[Review] += 1
+                review_objs.append(review)
+                review_comments.append(comments)
+        write_objects(Title.genre.through, links, chunk_size)
+        write_objects(Review, review_objs, chunk_size)
+        comment_objs = [
+            Comment(review_id=review.id, author_id=first_user_id + author,
+                    text=text, pub_date=now - timedelta(seconds=age))
+            for review, comments in zip(review_objs, review_comments)
+            for author, text, age in comments
+        ]
+        write_objects(Comment, comment_objs, chunk_size)
+    return len(title_objs), len(review_objs), len(comment_objs)
+
+
+def write_task(task):
+    """
+    Генерация и запись пачки в процессе-генераторе: так параллельно
+    выполняется и подготовка INSERT-ов в bulk_create
+    """
+    _, _, options = task
+    with keep_imported_dates(Review, Comment):
+        return write_titles(generate_task(task), options)
+
+
+class DataGenerator:
+    """
+    Синтетические данные для нагрузочных замеров: популярность произведений
+    и авторов распределена по закону Ципфа, пара (произведение, автор)
+    в отзывах не повторяется. Данные добавляются к существующим и
+    записываются пачками bulk_create.
+
+    Если СУБД возвращает id из bulk_create (PostgreSQL), процессы
+    workers и генерируют, и записывают данные. Иначе (SQLite) они только
+    генерируют, а записывает основной процесс, назначая id явно
+    """
+
+    def __init__(self, users, titles, reviews_per_title, comments_per_review,
+                 genres=20, categories=5, author_skew=1.0, seed=0,
+                 chunk_size=DEFAULT_CHUNK_SIZE, workers=1, log=None):
+        self.users_count = users
+        self.titles_count = titles
+        self.workers = workers
+        self.log = log or (lambda message: None)
+        self.options = {
+            'users': users,
+            'genres': genres,
+            'categories': categories,
+            'reviews_per_title': reviews_per_title,
+            'comments_per_review': comments_per_review,
+            'author_skew': author_skew,
+            'seed': seed,
+            'chunk_size': chunk_size,
+            'this_year': datetime.now().year,
+            'now': datetime.now(timezone.utc),
+        }
+        self.created = {model: 0 for model in (User, Title, Review, Comment)}
+
+    @property
+    def parallel_writes(self):
+        return (self.workers > 1
+                and connection.features.can_return_ids_from_bulk_insert)
+
+    def next_id(self, model):
+        return (model.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+
+    def create_dictionaries(self):
+        """Жанры и категории: используются существующие с такими slug"""
+        for model, count, label in ((Genre, self.options['genres'], 'Жанр'),
+                                    (Category, self.options['categories'],
+                                     'Категория')):
+            slugs = [f'generated-{model._meta.model_name}-{number}'
+                     for number in range(count)]
+            bulk_insert(model, [model(name=f'{label} {number}', slug=slug)
+                                for number, slug in enumerate(slugs)],
+                        ignore_conflicts=True)
+            ids = dict(model.objects.filter(slug__in=slugs)
+                       .values_list('slug', 'id'))
+            self.options[f'{model._meta.model_name}_ids'] = [
+                ids[slug] for slug in slugs
+            ]
+
+    def create_users(self):
+        # id пользователей идут подряд, поэтому процессам-генераторам
+        # достаточно передать первый из них
+        first_id = self.next_id(User)
+        password = make_password(None)
+        for start in range(0, self.users_count, self.options['chunk_size']):
+            stop = min(start + self.options['chunk_size'], self.users_count)
+            with transaction.atomic():
+                bulk_insert(User, [
+                    User(id=first_id + number,
+                         username=f'generated{first_id + number}',
+                         email=f'generated{first_id + number}@yamdb.fake',
+                         password=password)
+                    for number in range(start, stop)
+                ])
+        self.options['first_user_id'] = first_id
+        self.created[User] = self.users_count
+
+    def tasks(self):
+        for number, start in enumerate(range(0, self.titles_count,
+                                             TITLES_PER_TASK)):
+            count = min(TITLES_PER_TASK, self.titles_count - start)
+            yield number, count, self.options
+
+    def written_batches(self):
+        """Записывает данные пачками и возвращает их размеры"""
+        if self.workers <= 1:
+            next_ids = {Title: self.next_id(Title),
+                        Review: self.next_id(Review)}
+            for task in self.tasks():
+                yield write_titles(generate_task(task), self.options,
+                                   next_ids)
+            return
+        # Процессы получают копию соединения с БД при fork: закрываем его,
+        # чтобы ни один процесс не работал с чужим соединением
+        connections.close_all()
+        with Pool(self.workers) as pool:
+            if self.parallel_writes:
+                yield from pool.imap_unordered(write_task, self.tasks())
+                return
+            next_ids = {Title: self.next_id(Title),
+                        Review: self.next_id(Review)}
+            # imap сохраняет порядок задач, поэтому данные не зависят
+            # от числа процессов
+            for titles in pool.imap(generate_task, self.tasks()):
+                yield write_titles(titles, self.options, next_ids)
+
+    def run(self):
+        self.create_dictionaries()
+        self.create_users()
+        self.log(f'Пользователей: {self.users_count}')
+        with keep_imported_dates(Review, Comment):
+            for titles, reviews, comments in self.written_batches():
+                self.created[Title] += titles
+                self.created[Review] += reviews
+                self.created[Comment] += comments
+                self.log(f'Произведений: {self.created[Title]}, отзывов: '
+                         f'{self.created[Review]}, комментариев: '
+                         f'{self.created[Comment]}')
+        reset_sequences([User, Title, Review])
+        # bulk_create не отправляет сигналы, поэтому версии всех ресурсов
+        # сбрасываются разом
+        versions.bump_versions(versions.GLOBAL)
+        return self.created
@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.generator import DEFAULT_CHUNK_SIZE, DataGenerator, Distribution
+
+
+def distribution(spec):
+    try:
+        return Distribution(spec)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные для нагрузочного тестирования: '
+            'пользователей, произведения, отзывы и комментарии с '
+            'распределённой по закону Ципфа популярностью произведений '
+            'и авторов. Данные добавляются к существующим')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True,
+                            help='Количество пользователей')
+        parser.add_argument('--titles', type=int, required=True,
+                            help='Количество произведений')
+        parser.add_argument(
+            '--reviews-per-title', type=distribution,
+            default=Distribution('zipf:1.1:200'),
+            help=('Распределение числа отзывов на произведение: N, '
+                  'uniform:A:B или zipf:S:MAX (по умолчанию zipf:1.1:200); '
+                  'не больше числа пользователей')
+        )
+        parser.add_argument(
+            '--comments-per-review', type=distribution,
+            default=Distribution('zipf:1.5:20'),
+            help=('Распределение числа комментариев на отзыв '
+                  '(по умолчанию zipf:1.5:20)')
+        )
+        parser.add_argument('--genres', type=int, default=20,
+                            help='Количество жанров')
+        parser.add_argument('--categories', type=int, default=5,
+                            help='Количество категорий')
+        parser.add_argument(
+            '--author-skew', type=float, default=1.0,
+            help='Показатель закона Ципфа для активности авторов'
+        )
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE,
+                            help='Количество строк в одной пачке bulk_create')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help=('Число процессов, генерирующих данные, например '
+                  f'{os.cpu_count()}. На СУБД, возвращающих id из '
+                  'bulk_create (PostgreSQL), процессы и записывают свои '
+                  'данные, на остальных (SQLite) запись идёт в основном '
+                  'процессе')
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'titles', 'genres', 'categories',
+                     'chunk_size', 'workers'):
+            if options[name] < 1:
+                raise CommandError(
+                    f'--{name.replace("_", "-")} должен быть положительным'
+                )
+        if options['author_skew'] <= 0:
+            raise CommandError('--author-skew должен быть положительным')
+        started = time.monotonic()
+        verbose = options['verbosity'] > 0
+        created = DataGenerator(
+            users=options['users'],
+            titles=options['titles'],
+            reviews_per_title=options['reviews_per_title'],
+            comments_per_review=options['comments_per_review'],
+            genres=options['genres'],
+            categories=options['categories'],
+            author_skew=options['author_skew'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            log=self.stdout.write if verbose else None,
+        ).run()
+        elapsed = time.monotonic() - started
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(f'{model._meta.verbose_name_plural} - '
+                                    f'{count}'
+                                    for model, count in created.items())
+            + f' за {elapsed:.1f} с ({rows / elapsed:.0f} строк/с)'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from reviews.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = ('Создаёт (при необходимости) и перестраивает полнотекстовый '
+            'индекс произведений и отзывов, например после массовой '
+            'загрузки данных')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс перестроен ({type(backend).__name__})'
+        ))
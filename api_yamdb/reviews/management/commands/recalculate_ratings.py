@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews import versions
+from reviews.ratings import recalculate_ratings
+
+
+class Command(BaseCommand):
+    help = ('Сверяет сохранённые суммы и количества оценок произведений '
+            'с отзывами и исправляет расхождения (например, после '
+            'массового импорта)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recalculate_ratings()
+            if fixed:
+                versions.bump_versions(versions.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги пересчитаны, исправлено произведений: {fixed}'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reviews.outbox import send_batch
+
+
+class Command(BaseCommand):
+    help = ('Обработчик очереди исходящих писем: отправляет письма пачками '
+            'через одно соединение с почтовым бэкендом, повторяя неудачные '
+            'попытки с экспоненциальной задержкой')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Количество писем, отправляемых за одно соединение',
+        )
+        parser.add_argument(
+            '--max-attempts', type=int,
+            default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+            help='После стольких неудачных попыток письмо не отправляется',
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help='Пауза в секундах, если очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить всё, что готово к отправке, и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        started = time.monotonic()
+        try:
+            while True:
+                sent, failed = send_batch(options['batch_size'],
+                                          options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'Отправлено {sent}, ошибок {failed} '
+                        f'(всего {total_sent}, '
+                        f'{total_sent / elapsed:.0f} писем/с)'
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: отправлено {total_sent}, ошибок {total_failed}'
+        ))
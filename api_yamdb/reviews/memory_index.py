@@ -0,0 +1,132 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from reviews import versions
+
+
+class CatalogMemoryIndex:
+    """
+    Основа для индексов каталога в памяти процесса.
+
+    Индекс строится при первом обращении. Изменения в этом процессе
+    применяются наследниками сразу (сигналы после фиксации транзакции)
+    вместе с новой версией каталога (applying()). Изменения из других
+    процессов подхватываются перестройкой, если версия каталога
+    изменилась. Методу чтения можно передать версию, уже прочитанную
+    запросом (например, для ETag): тогда индекс не старше неё. Без версии
+    она проверяется не чаще чем раз в CATALOG_INDEX_REFRESH_INTERVAL
+    секунд.
+
+    Новый индекс строится из БД без self._lock: пока он строится, чтение
+    без версии обслуживает прежний, а готовый подменяет его целиком.
+
+    Наследники реализуют _empty() и _load(), возвращающие атрибуты
+    индекса; методы, меняющие или читающие данные, выполняются под
+    self._lock
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Индекс перестраивает только один поток
+        self._build_lock = threading.Lock()
+        self._built = False
+        self._version = None
+        self._checked_at = 0.0
+        self._set_state(self._empty())
+
+    @property
+    def built(self):
+        return self._built
+
+    def _empty(self):
+        """Атрибуты пустого индекса"""
+        raise NotImplementedError
+
+    def _load(self):
+        """Атрибуты индекса, построенного по данным БД"""
+        raise NotImplementedError
+
+    def _set_state(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _current_version(self):
+        return versions.get_versions([versions.GLOBAL, versions.CATALOG])
+
+    def _is_stale(self, version):
+        """Индекс не построен или старше версии version (None - любой)"""
+        if not self._built:
+            return True
+        return version is not None and any(
+            version[key] > built for key, built in self._version.items()
+        )
+
+    def _build(self, version=None):
+        # Версия (уже прочитанная запросом или текущая) читается до данных:
+        # изменение между двумя чтениями приведёт к лишней перестройке,
+        # но не потеряется
+        if version is None:
+            version = self._current_version()
+        state = self._load()
+        with self._lock:
+            self._set_state(state)
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._built = True
+
+    def _refresh(self, version=None):
+        """
+        Строит индекс или перестраивает его, если он старше версии
+        каталога version - словаря с версиями GLOBAL и CATALOG (None -
+        текущей версии из БД). Вызывается без self._lock
+        """
+        pinned = version is not None
+        if not pinned and self._built:
+            now = time.monotonic()
+            interval = settings.CATALOG_INDEX_REFRESH_INTERVAL
+            if now - self._checked_at < interval:
+                return
+            self._checked_at = now
+            version = self._current_version()
+        if not self._is_stale(version):
+            return
+        # Пока другой поток перестраивает индекс, чтение без заданной
+        # версии обслуживает прежний
+        if not self._build_lock.acquire(blocking=pinned or not self._built):
+            return
+        try:
+            # пока поток ждал, индекс мог перестроить другой поток
+            if self._is_stale(version):
+                self._build(version)
+        finally:
+            self._build_lock.release()
+
+    @contextmanager
+    def applying(self, catalog_version):
+        """
+        Изменения этого процесса внутри блока применяются к индексу
+        вместе с новой версией каталога catalog_version, поэтому они
+        не вызывают перестройку. Если версию между тем увеличил другой
+        процесс, она не совпадёт с ожидаемой, и индекс перестроится
+        """
+        with self._lock:
+            yield
+            expected = catalog_version - 1
+            if self._built and self._version[versions.CATALOG] == expected:
+                self._version = {**self._version,
+                                 versions.CATALOG: catalog_version}
+
+    def advance(self, catalog_version):
+        """Новая версия каталога после изменения, не затронувшего индекс"""
+        with self.applying(catalog_version):
+            pass
+
+    def reset(self):
+        """Сбрасывает индекс: он будет построен заново при обращении"""
+        with self._lock:
+            self._built = False
+            self._version = None
+            self._set_state(self._empty())
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_score_aggregates(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    Title = apps.get_model('reviews', 'Title')
+    aggregates = (Review.objects.exclude(title=None)
+                  .order_by()
+                  .values('title')
+                  .annotate(score_sum=Sum('score'), score_count=Count('id')))
+    for row in aggregates:
+        Title.objects.filter(pk=row['title']).update(
+            score_sum=row['score_sum'], score_count=row['score_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_auto_20220221_1938'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='score_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_score_aggregates,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_resourceversion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='reviews_com_text_2c573d_idx',
+        ),
+    ]
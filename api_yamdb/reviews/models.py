@@ -2,7 +2,10 @@ from datetime import datetime
 
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, When
+from django.db.models.functions import Cast
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -20,6 +23,9 @@ class User(AbstractUser):
     role = models.CharField(verbose_name='Роль', max_length=10,
                             choices=ROLE_CHOICES, default=AUTHENTICATED)
     bio = models.TextField(verbose_name='Биография', blank=True, null=True)
+    token_version = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Версия токенов'
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -32,6 +38,9 @@ class User(AbstractUser):
             )
         ]
 
+    # Изменение этих полей отзывает выданные пользователю токены
+    TOKEN_CLAIM_FIELDS = ('username', 'role', 'is_superuser', 'is_active')
+
     @property
     def is_admin(self):
         return self.role == User.ADMINISTRATOR
@@ -79,6 +88,25 @@ class Genre(models.Model):
         ]
 
 
+class TitleQuerySet(models.QuerySet):
+    """QuerySet произведений с вычислением рейтинга на стороне БД"""
+
+    def with_rating(self):
+        """
+        Аннотирует рейтинг по сохранённым агрегатам оценок: без JOIN и
+        GROUP BY по отзывам, поэтому по нему можно дёшево сортировать и
+        фильтровать
+        """
+        return self.annotate(rating=Case(
+            When(score_count=0, then=None),
+            default=ExpressionWrapper(
+                Cast('score_sum', FloatField()) / F('score_count'),
+                output_field=FloatField()
+            ),
+            output_field=FloatField(),
+        ))
+
+
 class Title(models.Model):
     """
     Модель произведения, к которым пишут отзывы (определённый фильм, книга
@@ -101,6 +129,12 @@ class Title(models.Model):
                                  on_delete=models.SET_NULL,
                                  null=True,
                                  verbose_name='Категория произведения')
+    score_sum = models.PositiveIntegerField(default=0, editable=False,
+                                            verbose_name='Сумма оценок')
+    score_count = models.PositiveIntegerField(default=0, editable=False,
+                                              verbose_name='Количество оценок')
+
+    objects = TitleQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -134,6 +168,12 @@ class Review(models.Model):
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        # Сохранение отзыва и пересчёт рейтинга произведения в сигналах
+        # должны выполняться в одной транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Отзыв'
@@ -166,6 +206,69 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         indexes = [
-            models.Index(fields=['text', ]),
             models.Index(fields=['author', ]),
         ]
+
+
+class OutgoingEmail(models.Model):
+    """
+    Очередь исходящих писем (outbox). Письма отправляет отдельный процесс
+    `manage.py run_mail_worker`, а не обработчик запроса
+    """
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает отправки'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не удалось отправить'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст письма')
+    from_email = models.CharField(max_length=254, verbose_name='Отправитель')
+    recipient = models.EmailField(max_length=254, verbose_name='Получатель')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Количество попыток отправки'
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Время следующей попытки'
+    )
+    last_error = models.TextField(blank=True,
+                                  verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Дата создания')
+    sent_at = models.DateTimeField(null=True, blank=True,
+                                   verbose_name='Дата отправки')
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+class ResourceVersion(models.Model):
+    """
+    Версии отдельных ресурсов и коллекций API. Увеличиваются при изменении
+    данных и служат основой ETag для условных GET-запросов
+    """
+
+    key = models.CharField(max_length=100, primary_key=True,
+                           verbose_name='Ключ ресурса')
+    version = models.BigIntegerField(default=0, verbose_name='Версия')
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+    class Meta:
+        verbose_name = 'Версия ресурса'
+        verbose_name_plural = 'Версии ресурсов'
@@ -0,0 +1,104 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, body, recipient, from_email=None):
+    """Ставит письмо в очередь на отправку"""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        recipient=recipient,
+        from_email=from_email or settings.EMAIL_SENDER,
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой отправки"""
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def claim_batch(batch_size):
+    """
+    Забирает пачку писем, готовых к отправке, и откладывает для них
+    следующую попытку на время аренды, чтобы параллельный обработчик
+    не взял их повторно
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = OutgoingEmail.objects.filter(
+            status=OutgoingEmail.PENDING, next_attempt_at__lte=now
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        batch = list(queryset[:batch_size])
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in batch]
+        ).update(next_attempt_at=now + timedelta(
+            seconds=settings.EMAIL_OUTBOX_LEASE
+        ))
+    return batch
+
+
+def mark_failed(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=('attempts', 'last_error', 'status',
+                              'next_attempt_at'))
+    logger.warning('Не удалось отправить письмо %s (попытка %s): %s',
+                   email.pk, email.attempts, error)
+
+
+def send_batch(batch_size=None, max_attempts=None):
+    """
+    Отправляет пачку писем из очереди через одно соединение с почтовым
+    бэкендом. Возвращает пару (отправлено, с ошибкой)
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+    except Exception as error:
+        for email in batch:
+            mark_failed(email, error, max_attempts)
+        return 0, len(batch)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body,
+                                   email.from_email, [email.recipient],
+                                   connection=mail_connection)
+            try:
+                message.send()
+            except Exception as error:
+                mark_failed(email, error, max_attempts)
+                failed += 1
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        mail_connection.close()
+
+    OutgoingEmail.objects.filter(pk__in=sent_ids).update(
+        status=OutgoingEmail.SENT, sent_at=timezone.now(), last_error=''
+    )
+    return len(sent_ids), failed
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from reviews.models import Review, Title
+
+RECALCULATE_BATCH_SIZE = 500
+
+
+def apply_score_change(title_id, score_delta, count_delta):
+    """
+    Атомарно изменяет сохранённые сумму и количество оценок произведения
+    """
+    if title_id is None or (score_delta == 0 and count_delta == 0):
+        return
+    Title.objects.filter(pk=title_id).update(
+        score_sum=F('score_sum') + score_delta,
+        score_count=F('score_count') + count_delta,
+    )
+
+
+def _review_aggregate(aggregate):
+    reviews = (Review.objects.filter(title=OuterRef('pk'))
+               .order_by()
+               .values('title')
+               .annotate(value=aggregate)
+               .values('value'))
+    return Coalesce(Subquery(reviews, output_field=IntegerField()), 0)
+
+
+def actual_ratings():
+    """
+    Выражения с реальными суммой и количеством оценок по таблице отзывов
+    """
+    return {
+        'score_sum': _review_aggregate(Sum('score')),
+        'score_count': _review_aggregate(Count('id')),
+    }
+
+
+def recalculate_ratings(queryset=None):
+    """
+    Сверяет сохранённые агрегаты оценок с реальными и исправляет расхождения.
+    Возвращает количество исправленных произведений.
+    """
+    if queryset is None:
+        queryset = Title.objects.all()
+    drifted = (queryset.annotate(**{f'actual_{name}': expression
+                                    for name, expression
+                                    in actual_ratings().items()})
+               .exclude(score_sum=F('actual_score_sum'),
+                        score_count=F('actual_score_count'))
+               .values_list('pk', flat=True))
+    drifted_ids = list(drifted)
+    for start in range(0, len(drifted_ids), RECALCULATE_BATCH_SIZE):
+        batch = drifted_ids[start:start + RECALCULATE_BATCH_SIZE]
+        Title.objects.filter(pk__in=batch).update(**actual_ratings())
+    return len(drifted_ids)
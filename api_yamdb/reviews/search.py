@@ -0,0 +1,161 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from reviews.models import Review, Title
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def query_tokens(query):
+    """Слова поискового запроса без операторов и спецсимволов"""
+    return TOKEN_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+    """
+    Полнотекстовый поиск по произведениям (название и описание) и текстам
+    отзывов. Методы filter_* возвращают QuerySet, отфильтрованный по
+    запросу и отсортированный по релевантности (аннотация search_rank,
+    меньше - релевантнее)
+    """
+
+    def install(self):
+        """Создаёт структуры индекса, если их нет. Возвращает True,
+        если индекс создан заново и его нужно заполнить"""
+        return False
+
+    def rebuild(self):
+        """Перестраивает индекс по данным таблиц (после массовой загрузки)"""
+
+    def filter_titles(self, queryset, query):
+        raise NotImplementedError
+
+    def filter_reviews(self, queryset, query):
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """
+    Запасной вариант для СУБД без полнотекстового индекса: поиск
+    всех слов запроса через LIKE, без ранжирования
+    """
+
+    def _filter(self, queryset, query, fields):
+        for token in query_tokens(query):
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': token})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by('-id')
+
+    def filter_titles(self, queryset, query):
+        return self._filter(queryset, query, ('name', 'description'))
+
+    def filter_reviews(self, queryset, query):
+        return self._filter(queryset, query, ('text',))
+
+
+class SqliteFTS5Backend(BaseSearchBackend):
+    """
+    Поиск на индексах SQLite FTS5. Индексы хранят только словари (external
+    content) и поддерживаются в актуальном состоянии триггерами, поэтому
+    учитывают и массовые операции в обход ORM
+    """
+    # Таблица, индекс, индексируемые колонки и их веса в bm25
+    indexes = (
+        (Title._meta.db_table, 'reviews_title_fts',
+         (('name', 10.0), ('description', 1.0))),
+        (Review._meta.db_table, 'reviews_review_fts',
+         (('text', 1.0),)),
+    )
+
+    def _schema(self, table, index, columns):
+        names = ', '.join(name for name, _ in columns)
+        new_values = ', '.join(f'new.{name}' for name, _ in columns)
+        old_values = ', '.join(f'old.{name}' for name, _ in columns)
+        delete_old = (
+            f"INSERT INTO {index}({index}, rowid, {names}) "
+            f"VALUES ('delete', old.id, {old_values});"
+        )
+        insert_new = (
+            f'INSERT INTO {index}(rowid, {names}) '
+            f'VALUES (new.id, {new_values});'
+        )
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"{names}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')",
+            f'CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} '
+            f'BEGIN {insert_new} END',
+            f'CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} '
+            f'BEGIN {delete_old} END',
+            f'CREATE TRIGGER IF NOT EXISTS {index}_au '
+            f'AFTER UPDATE OF {names} ON {table} '
+            f'BEGIN {delete_old} {insert_new} END',
+        ]
+
+    def install(self):
+        existing = set(connection.introspection.table_names())
+        created = False
+        with connection.cursor() as cursor:
+            for table, index, columns in self.indexes:
+                created = created or index not in existing
+                for statement in self._schema(table, index, columns):
+                    cursor.execute(statement)
+        return created
+
+    def rebuild(self):
+        self.install()
+        with connection.cursor() as cursor:
+            for _, index, _ in self.indexes:
+                cursor.execute(
+                    f"INSERT INTO {index}({index}) VALUES ('rebuild')"
+                )
+
+    @staticmethod
+    def match_expression(query):
+        # Каждое слово ищется как префикс, все слова обязательны
+        return ' '.join(f'"{token}"*' for token in query_tokens(query))
+
+    def _filter(self, queryset, query, table, index, columns):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        weights = ', '.join(str(weight) for _, weight in columns)
+        # RawSQL в id__in оборачивается в двойные скобки, и SQLite считает
+        # подзапрос скалярным (берёт только первую строку), поэтому условие
+        # добавляется через extra
+        return queryset.extra(where=[
+            f'"{table}"."id" IN '
+            f'(SELECT rowid FROM {index} WHERE {index} MATCH %s)'
+        ], params=[expression]).annotate(search_rank=RawSQL(
+            f'SELECT bm25({index}, {weights}) FROM {index} '
+            f'WHERE {index} MATCH %s AND rowid = "{table}"."id"',
+            (expression,),
+            output_field=FloatField(),
+        )).order_by('search_rank', '-id')
+
+    def filter_titles(self, queryset, query):
+        return self._filter(queryset, query, *self.indexes[0])
+
+    def filter_reviews(self, queryset, query):
+        return self._filter(queryset, query, *self.indexes[1])
+
+
+def get_search_backend():
+    """
+    Бэкенд поиска из настройки FULL_TEXT_SEARCH_BACKEND; если она не задана,
+    для SQLite используется FTS5, для остальных СУБД - LIKE
+    """
+    if settings.FULL_TEXT_SEARCH_BACKEND:
+        return import_string(settings.FULL_TEXT_SEARCH_BACKEND)()
+    if connection.vendor == 'sqlite':
+        return SqliteFTS5Backend()
+    return LikeSearchBackend()
@@ -0,0 +1,232 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete,
+                                      post_migrate, post_save, pre_save)
+from django.dispatch import receiver
+
+from reviews import versions
+from reviews.models import Category, Comment, Genre, Review, Title, User
+from reviews.bitmaps import title_bitmap_index
+from reviews.ratings import apply_score_change
+from reviews.search import get_search_backend
+from reviews.suggest import title_suggest_index
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_score(sender, instance, raw, **kwargs):
+    """Запоминает оценку и произведение отзыва до его изменения"""
+    instance._previous_score = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_score = (
+        Review.objects.filter(pk=instance.pk)
+        .values_list('title_id', 'score')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw, **kwargs):
+    """Обновляет агрегаты оценок произведения при создании/изменении отзыва"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_score', None)
+    if created or previous is None:
+        apply_score_change(instance.title_id, instance.score, 1)
+        return
+    previous_title_id, previous_score = previous
+    if previous_title_id == instance.title_id:
+        apply_score_change(instance.title_id,
+                           instance.score - previous_score, 0)
+        return
+    apply_score_change(previous_title_id, -previous_score, -1)
+    apply_score_change(instance.title_id, instance.score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    """
+    Обновляет агрегаты оценок произведения при удалении отзыва, в том числе
+    каскадном
+    """
+    apply_score_change(instance.title_id, -instance.score, -1)
+
+
+@receiver(pre_save, sender=User)
+def bump_token_version(sender, instance, raw, **kwargs):
+    """
+    Увеличивает версию токенов пользователя при изменении данных,
+    которые в них записаны, чтобы старые токены перестали приниматься
+    """
+    if raw or instance.pk is None:
+        return
+    previous = (User.objects.filter(pk=instance.pk)
+                .values(*User.TOKEN_CLAIM_FIELDS, 'token_version')
+                .first())
+    if previous is None:
+        return
+    if any(previous[field] != getattr(instance, field)
+           for field in User.TOKEN_CLAIM_FIELDS):
+        instance.token_version = previous['token_version'] + 1
+    if previous['username'] != instance.username:
+        versions.bump_versions(versions.AUTHORS)
+
+
+def bump_catalog_versions(instance, *keys):
+    """
+    Увеличивает версии keys и версию каталога. Новая версия каталога
+    запоминается в instance._catalog_version: с ней индексы в памяти
+    отличают изменения этого процесса от изменений других процессов
+    """
+    instance._catalog_version = versions.bump_versions(
+        versions.CATALOG, *keys, returning=True
+    )[versions.CATALOG]
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def bump_title_versions(sender, instance, **kwargs):
+    bump_catalog_versions(instance, versions.TITLES,
+                          versions.title_key(instance.pk),
+                          versions.reviews_key(instance.pk))
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_title_genre_versions(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    if action == 'pre_clear' and reverse:
+        # В post_clear со стороны жанра список его произведений уже
+        # недоступен, поэтому он запоминается до удаления связей
+        instance._cleared_title_ids = list(
+            sender.objects.filter(genre_id=instance.pk)
+            .values_list('title_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        title_ids = [instance.pk]
+    elif pk_set is not None:
+        title_ids = pk_set
+    else:
+        title_ids = getattr(instance, '_cleared_title_ids', [])
+    bump_catalog_versions(instance, versions.TITLES,
+                          *map(versions.title_key, title_ids))
+
+
+@receiver(post_save, sender=Title)
+def update_memory_indexes(sender, instance, raw, **kwargs):
+    """Обновляет индексы каталога в памяти после фиксации транзакции"""
+    if raw:
+        return
+    pk, name, year = instance.pk, instance.name, instance.year
+    category_id = instance.category_id
+    catalog_version = instance._catalog_version
+
+    def update():
+        with title_suggest_index.applying(catalog_version):
+            title_suggest_index.update(pk, name, year)
+        with title_bitmap_index.applying(catalog_version):
+            title_bitmap_index.update_title(pk, category_id, year)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Title)
+def remove_from_memory_indexes(sender, instance, **kwargs):
+    pk = instance.pk
+    catalog_version = instance._catalog_version
+
+    def remove():
+        with title_suggest_index.applying(catalog_version):
+            title_suggest_index.remove(pk)
+        with title_bitmap_index.applying(catalog_version):
+            title_bitmap_index.remove_title(pk)
+    transaction.on_commit(remove)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_genre_bitmaps(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    pk = instance.pk
+    pk_set = None if pk_set is None else set(pk_set)
+    catalog_version = instance._catalog_version
+    index = title_bitmap_index
+    if not reverse:
+        change = {
+            'post_add': lambda: index.add_genres(pk, pk_set),
+            'post_remove': lambda: index.remove_genres(pk, pk_set),
+            'post_clear': lambda: index.remove_genres(pk),
+        }[action]
+    else:
+        change = {
+            'post_add': lambda: index.add_titles_to_genre(pk, pk_set),
+            'post_remove': lambda: index.remove_titles_from_genre(pk, pk_set),
+            'post_clear': lambda: index.remove_titles_from_genre(pk),
+        }[action]
+
+    def update():
+        with index.applying(catalog_version):
+            change()
+        # Жанры не входят в индекс подсказок, но меняют версию каталога
+        title_suggest_index.advance(catalog_version)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def bump_genre_versions(sender, instance, **kwargs):
+    # Жанры вложены в ответы о произведениях
+    bump_catalog_versions(instance, versions.GENRES, versions.TITLES)
+    catalog_version = instance._catalog_version
+
+    def update():
+        # Битовые карты ссылаются на жанры по slug
+        title_bitmap_index.reset()
+        title_suggest_index.advance(catalog_version)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_versions(sender, instance, **kwargs):
+    # Категории вложены в ответы о произведениях
+    bump_catalog_versions(instance, versions.CATEGORIES, versions.TITLES)
+    catalog_version = instance._catalog_version
+
+    def update():
+        title_bitmap_index.reset()
+        title_suggest_index.advance(catalog_version)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_versions(sender, instance, **kwargs):
+    # От отзывов зависит рейтинг, поэтому меняется и версия произведения
+    keys = [versions.TITLES, versions.title_key(instance.title_id),
+            versions.reviews_key(instance.title_id)]
+    previous = getattr(instance, '_previous_score', None)
+    if previous is not None and previous[0] != instance.title_id:
+        keys += [versions.title_key(previous[0]),
+                 versions.reviews_key(previous[0])]
+    versions.bump_versions(*keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    versions.bump_versions(versions.comments_key(instance.review_id))
+
+
+@receiver(post_migrate)
+def install_search_index(sender, **kwargs):
+    """
+    Создаёт полнотекстовый индекс после миграций (в том числе если
+    пересоздание таблицы при миграции удалило его триггеры)
+    """
+    if sender.name != 'reviews':
+        return
+    backend = get_search_backend()
+    if backend.install():
+        backend.rebuild()
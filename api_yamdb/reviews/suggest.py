@@ -0,0 +1,100 @@
+from bisect import bisect_left
+
+from reviews.memory_index import CatalogMemoryIndex
+from reviews.models import Title
+
+SUGGEST_BUILD_CHUNK_SIZE = 5000
+
+
+def normalize(text):
+    """
+    Ключ для поиска по началу названия: без учёта регистра (casefold
+    корректно обрабатывает кириллицу), ё приравнивается к е, пробелы
+    схлопываются
+    """
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+class TitleSuggestIndex(CatalogMemoryIndex):
+    """
+    Отсортированный список нормализованных названий произведений в памяти
+    процесса. Поиск по префиксу - двоичный поиск и чтение подряд идущих
+    записей, без обращения к БД
+    """
+
+    def _empty(self):
+        return {
+            # Параллельные списки, упорядоченные по (ключ, id)
+            '_keys': [],
+            '_ids': [],
+            # id -> (ключ, название, год)
+            '_titles': {},
+        }
+
+    def _load(self):
+        rows = (Title.objects.order_by().values_list('id', 'name', 'year')
+                .iterator(chunk_size=SUGGEST_BUILD_CHUNK_SIZE))
+        titles = {pk: (normalize(name), name, year)
+                  for pk, name, year in rows}
+        entries = sorted((key, pk) for pk, (key, _, _) in titles.items())
+        return {
+            '_keys': [key for key, _ in entries],
+            '_ids': [pk for _, pk in entries],
+            '_titles': titles,
+        }
+
+    def _remove(self, pk):
+        entry = self._titles.pop(pk, None)
+        if entry is None:
+            return
+        index = bisect_left(self._keys, entry[0])
+        while self._ids[index] != pk:
+            index += 1
+        del self._keys[index]
+        del self._ids[index]
+
+    def update(self, pk, name, year):
+        """Добавляет или обновляет произведение в построенном индексе"""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(pk)
+            key = normalize(name)
+            index = bisect_left(self._keys, key)
+            # среди одинаковых названий порядок по id
+            while (index < len(self._keys) and self._keys[index] == key
+                   and self._ids[index] < pk):
+                index += 1
+            self._keys.insert(index, key)
+            self._ids.insert(index, pk)
+            self._titles[pk] = (key, name, year)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._built:
+                self._remove(pk)
+
+    def suggest(self, prefix, limit):
+        """
+        Не больше limit произведений, название которых начинается
+        с prefix, в алфавитном порядке
+        """
+        key = normalize(prefix)
+        if not key:
+            return []
+        self._refresh()
+        with self._lock:
+            index = bisect_left(self._keys, key)
+            result = []
+            for position in range(index, len(self._keys)):
+                if len(result) >= limit:
+                    break
+                if not self._keys[position].startswith(key):
+                    break
+                pk = self._ids[position]
+                _, name, year = self._titles[pk]
+                result.append({'id': pk, 'name': name, 'year': year})
+        return result
+
+
+title_suggest_index = TitleSuggestIndex()
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from reviews.models import ResourceVersion
+
+# Общая версия всех ресурсов: увеличивается массовыми операциями
+# (импорт, генерация данных), которые обходят сигналы моделей
+GLOBAL = 'global'
+TITLES = 'titles'
+# Состав каталога: названия, годы, жанры и категории произведений (без
+# рейтингов, которые меняются с каждым отзывом)
+CATALOG = 'catalog'
+GENRES = 'genres'
+CATEGORIES = 'categories'
+# Имена авторов выводятся в отзывах и комментариях
+AUTHORS = 'authors'
+
+
+def title_key(title_id):
+    return f'title:{title_id}'
+
+
+def reviews_key(title_id):
+    return f'reviews:{title_id}'
+
+
+def comments_key(review_id):
+    return f'comments:{review_id}'
+
+
+def _cache():
+    if settings.RESOURCE_VERSION_CACHE_ALIAS:
+        return caches[settings.RESOURCE_VERSION_CACHE_ALIAS]
+    return None
+
+
+def _cache_key(key):
+    return f'resource_version:{key}'
+
+
+def bump_versions(*keys, returning=False):
+    """
+    Увеличивает версии ресурсов после изменения их данных одним UPDATE
+    на все ключи. С returning=True возвращает новые версии ключей
+    (ещё один запрос)
+    """
+    keys = set(keys)
+    versions = ResourceVersion.objects.filter(key__in=keys)
+    updated = versions.update(version=F('version') + 1)
+    if updated < len(keys):
+        # Версия ресурса создаётся при первом его изменении. Повторное
+        # увеличение уже существующих версий безвредно: важно лишь,
+        # что версия изменилась
+        missing = keys
+        if returning:
+            # Новые версии возвращаются ровно на единицу больше прежних,
+            # поэтому уже увеличенные версии не трогаются. Если между
+            # UPDATE и чтением ключей версию создал другой процесс,
+            # неизвестно, какие из них увеличены: увеличиваются все
+            existing = set(versions.values_list('key', flat=True))
+            if len(existing) == updated:
+                missing = keys - existing
+        ResourceVersion.objects.bulk_create(
+            [ResourceVersion(key=key, version=0) for key in missing],
+            ignore_conflicts=True
+        )
+        versions.filter(key__in=missing).update(version=F('version') + 1)
+    cache = _cache()
+    if cache is not None:
+        cache_keys = [_cache_key(key) for key in keys]
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+    if returning:
+        return dict(versions.values_list('key', 'version'))
+
+
+def get_versions(keys):
+    """
+    Текущие версии ресурсов: не больше одного запроса по первичному ключу,
+    а при настроенном кеше - без обращения к БД
+    """
+    versions = {}
+    missing = list(keys)
+    cache = _cache()
+    if cache is not None:
+        cached = cache.get_many([_cache_key(key) for key in keys])
+        for key in keys:
+            if _cache_key(key) in cached:
+                versions[key] = cached[_cache_key(key)]
+        missing = [key for key in keys if key not in versions]
+    if missing:
+        found = dict(ResourceVersion.objects.filter(key__in=missing)
+                     .values_list('key', 'version'))
+        fetched = {key: found.get(key, 0) for key in missing}
+        versions.update(fetched)
+        if cache is not None:
+            cache.set_many({_cache_key(key): version
+                            for key, version in fetched.items()})
+    return versions
@@ -1,6 +1,7 @@
 import os
 import sys
 
+import pytest
 from django.utils.version import get_version
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,3 +35,25 @@ assert get_version() < '3.0.0', 'Пожалуйста, используйте в
 pytest_plugins = [
     'tests.fixtures.fixture_user',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # БД между тестами очищается, и версии ресурсов начинаются заново,
+    # поэтому закешированные ответы и индексы в памяти прошлых тестов
+    # нужно сбросить
+    from django.core.cache import caches
+    from reviews.bitmaps import title_bitmap_index
+    from reviews.suggest import title_suggest_index
+    for cache in caches.all():
+        cache.clear()
+    title_suggest_index.reset()
+    title_bitmap_index.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    # Превышение бюджета запросов к БД и N+1 в тестах - ошибка,
+    # а не запись в журнал
+    settings.QUERY_BUDGET_RAISE = True
@@ -0,0 +1,60 @@
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, Title
+
+from .common import create_reviews
+
+
+class Test08RatingAggregates:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_follows_review_changes(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.score_sum, title.score_count) == (12, 3), (
+            'Проверьте, что при создании отзыва обновляются сумма и количество оценок произведения'
+        )
+
+        response = admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/',
+            data={'score': 8}
+        )
+        assert response.status_code == 200
+        title.refresh_from_db()
+        assert (title.score_sum, title.score_count) == (15, 3), (
+            'Проверьте, что при изменении оценки отзыва обновляется сумма оценок произведения'
+        )
+
+        response = admin_client.delete(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[1]["id"]}/'
+        )
+        assert response.status_code == 204
+        title.refresh_from_db()
+        assert (title.score_sum, title.score_count) == (12, 2), (
+            'Проверьте, что при удалении отзыва обновляются сумма и количество оценок произведения'
+        )
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') == 6
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_rating_follows_cascade_delete(self, admin_client, admin):
+        _, titles, user, _ = create_reviews(admin_client, admin)
+        user.delete()
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.score_sum, title.score_count) == (9, 2), (
+            'Проверьте, что при каскадном удалении отзывов обновляются агрегаты оценок произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_recalculate_ratings_command(self, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        Title.objects.update(score_sum=0, score_count=0)
+        Review.objects.filter(title_id=titles[0]['id']).update(score=10)
+        call_command('recalculate_ratings')
+        title = Title.objects.get(id=titles[0]['id'])
+        assert (title.score_sum, title.score_count) == (30, 3), (
+            'Проверьте, что команда `recalculate_ratings` восстанавливает агрегаты оценок'
+        )
+        title = Title.objects.get(id=titles[1]['id'])
+        assert (title.score_sum, title.score_count) == (0, 0)
@@ -0,0 +1,54 @@
+import pytest
+
+from .common import auth_client, create_reviews, create_titles
+
+
+class Test09TitleFilters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_ordering_and_filters(self, admin_client, admin):
+        _, titles, user, _ = create_reviews(admin_client, admin)
+        auth_client(user).post(
+            f'/api/v1/titles/{titles[1]["id"]}/reviews/',
+            data={'text': 'Отлично', 'score': 9}
+        )
+
+        response = admin_client.get('/api/v1/titles/?ordering=-rating')
+        assert response.status_code == 200
+        ratings = [title['rating'] for title in response.json()['results']]
+        assert ratings == [9, 4], (
+            'Проверьте, что `/api/v1/titles/` поддерживает сортировку `ordering=-rating`'
+        )
+
+        response = admin_client.get('/api/v1/titles/?ordering=year')
+        years = [title['year'] for title in response.json()['results']]
+        assert years == [2000, 2020], (
+            'Проверьте, что `/api/v1/titles/` поддерживает сортировку `ordering=year`'
+        )
+
+        response = admin_client.get('/api/v1/titles/?rating_min=5')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[1]['id']], (
+            'Проверьте, что `/api/v1/titles/` поддерживает фильтр `rating_min`'
+        )
+        response = admin_client.get('/api/v1/titles/?rating_max=5')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[0]['id']], (
+            'Проверьте, что `/api/v1/titles/` поддерживает фильтр `rating_max`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_list_query_count(self, client, admin_client,
+                                       django_assert_max_num_queries):
+        create_titles(admin_client)
+        for number in range(10):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {number}', 'year': 2001,
+                'genre': ['horror', 'drama'], 'category': 'films'
+            })
+        # версии для ETag, COUNT для пагинации, страница с категориями,
+        # жанры страницы
+        with django_assert_max_num_queries(4):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        assert len(response.json()['results']) == 10
@@ -0,0 +1,74 @@
+import pytest
+
+from .common import create_reviews
+
+
+class Test10CursorPagination:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_cursor_pagination(self, admin_client):
+        admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'films'})
+        for number in range(15):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {number}', 'year': 2000, 'category': 'films',
+                'genre': []
+            })
+        response = admin_client.get('/api/v1/titles/?pagination=cursor')
+        assert response.status_code == 200
+        data = response.json()
+        assert 'count' not in data, (
+            'Проверьте, что в режиме `pagination=cursor` не считается общее количество объектов'
+        )
+        assert len(data['results']) == 10
+        assert data['previous'] is None
+        first_page_ids = [title['id'] for title in data['results']]
+        assert first_page_ids == sorted(first_page_ids, reverse=True)
+
+        response = admin_client.get(data['next'])
+        assert response.status_code == 200
+        next_data = response.json()
+        second_page_ids = [title['id'] for title in next_data['results']]
+        assert len(second_page_ids) == 5
+        assert max(second_page_ids) < min(first_page_ids), (
+            'Проверьте, что курсорная пагинация продолжает выдачу по ключу `-id`'
+        )
+        assert next_data['next'] is None
+
+        response = admin_client.get('/api/v1/titles/?cursor=cD0xMA%3D%3D')
+        assert response.status_code == 404, (
+            'Проверьте, что поддельный курсор отклоняется'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_page_number_pagination_by_default(self, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/')
+        assert response.json()['count'] == 3
+        response = admin_client.get(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/?pagination=cursor'
+        )
+        data = response.json()
+        assert 'count' not in data
+        assert len(data['results']) == 3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_cursor_with_ordering(self, admin_client):
+        for number in range(3):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {number}', 'year': 2000 + number,
+                'genre': []
+            })
+        for query in ('pagination=cursor&ordering=year',
+                      'pagination=cursor&q=Произведение',
+                      'cursor=x&ordering=-name'):
+            response = admin_client.get(f'/api/v1/titles/?{query}')
+            assert response.status_code == 400, (
+                'Проверьте, что курсорная пагинация с `ordering` или `q` '
+                f'отклоняется: {query}'
+            )
+            assert 'pagination' in response.json()
+        response = admin_client.get('/api/v1/titles/?ordering=year&q=')
+        assert response.status_code == 200
+        response = admin_client.get('/api/v1/titles/?pagination=cursor'
+                                    '&ordering=')
+        assert response.status_code == 200
@@ -0,0 +1,56 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Comment, Review, Title, User
+
+
+class Test11ImportCsv:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_import_csv(self, admin):
+        call_command('import_csv', '--chunk-size', '10', stdout=StringIO())
+        assert Title.objects.count() == 32
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert Title.genre.through.objects.count() == 42
+        assert User.objects.filter(pk=admin.pk).exists(), (
+            'Проверьте, что `import_csv` в режиме replace не удаляет администраторов'
+        )
+        review = Review.objects.get(pk=1)
+        assert review.pub_date.year == 2019, (
+            'Проверьте, что `import_csv` сохраняет дату публикации из файла'
+        )
+        title = Title.objects.get(pk=1)
+        assert (title.score_sum, title.score_count) == (
+            sum(title.reviews.values_list('score', flat=True)),
+            title.reviews.count()
+        ), 'Проверьте, что после импорта пересчитываются рейтинги произведений'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_import_csv_append(self):
+        call_command('import_csv', stdout=StringIO())
+        Comment.objects.filter(pk=1).delete()
+        call_command('import_csv', '--mode', 'append', stdout=StringIO())
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3, (
+            'Проверьте, что режим append добавляет только отсутствующие строки'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_append_with_conflicting_slug(self):
+        from reviews.models import Category
+        Category.objects.create(id=50, name='Кино', slug='movie')
+        stdout = StringIO()
+        call_command('import_csv', '--mode', 'append', stdout=stdout)
+        assert not Category.objects.filter(pk=1).exists()
+        assert Title.objects.count() == 32, (
+            'Проверьте, что строка, конфликтующая по slug, пропускается, '
+            'а импорт продолжается'
+        )
+        assert not Title.objects.filter(category_id=1).exists(), (
+            'Проверьте, что ссылки на пропущенные строки не сохраняются'
+        )
+        assert ('category.csv: пропущено из-за конфликта уникальных полей '
+                'с существующими строками: 1') in stdout.getvalue()
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from .common import create_comments
+
+
+def stream_lines(response):
+    content = b''.join(response.streaming_content).decode()
+    return [line for line in content.split('\n') if line]
+
+
+class Test12Export:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_export_permissions(self, client, user_client):
+        response = client.get('/api/v1/export/titles/')
+        assert response.status_code == 401
+        response = user_client.get('/api/v1/export/titles/')
+        assert response.status_code == 403, (
+            'Проверьте, что выгрузка доступна только администратору'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_export_ndjson_and_csv(self, admin_client, admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        response = admin_client.get('/api/v1/export/titles/?genre=comedy')
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in stream_lines(response)]
+        assert [row['id'] for row in rows] == [titles[0]['id']], (
+            'Проверьте, что выгрузка произведений поддерживает фильтры TitleFilter'
+        )
+        assert sorted(rows[0]['genre']) == ['comedy', 'horror']
+        assert rows[0]['rating'] == 4
+
+        response = admin_client.get(
+            f'/api/v1/export/reviews/?since_id={reviews[0]["id"]}'
+        )
+        rows = [json.loads(line) for line in stream_lines(response)]
+        assert [row['id'] for row in rows] == [review['id'] for review in reviews[1:]], (
+            'Проверьте, что выгрузка отзывов поддерживает `since_id`'
+        )
+
+        response = admin_client.get('/api/v1/export/comments/?output=csv')
+        assert response['Content-Type'].startswith('text/csv')
+        lines = stream_lines(response)
+        assert lines[0].strip() == 'id,review_id,title_id,author,text,pub_date'
+        assert len(lines) == len(comments) + 1
+
+        response = admin_client.get('/api/v1/export/reviews/?since=never')
+        assert response.status_code == 400
@@ -0,0 +1,63 @@
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+from reviews.outbox import send_batch
+
+
+class BrokenConnection:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def open(self):
+        raise ConnectionError('SMTP недоступен')
+
+    def close(self):
+        pass
+
+
+class Test13MailOutbox:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_enqueues_email(self, client):
+        outbox_before_count = len(mail.outbox)
+        data = {'email': 'queued@yamdb.fake', 'username': 'queued'}
+        response = client.post('/api/v1/auth/signup/', data=data)
+        assert response.status_code == 200
+        assert len(mail.outbox) == outbox_before_count, (
+            'Проверьте, что регистрация не отправляет письмо в обработчике запроса'
+        )
+        email = OutgoingEmail.objects.get(recipient='queued@yamdb.fake')
+        assert email.status == OutgoingEmail.PENDING
+
+        call_command('run_mail_worker', '--once', stdout=StringIO())
+        assert len(mail.outbox) == outbox_before_count + 1
+        assert mail.outbox[-1].to == ['queued@yamdb.fake']
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.SENT
+        assert email.sent_at is not None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_failed_send_is_retried_with_backoff(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_13_mail_outbox.BrokenConnection'
+        email = OutgoingEmail.objects.create(
+            subject='Тема', body='Текст', from_email='from@example.com',
+            recipient='retry@yamdb.fake'
+        )
+        assert send_batch(max_attempts=2) == (0, 1)
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.PENDING
+        assert email.attempts == 1
+        assert email.next_attempt_at > timezone.now(), (
+            'Проверьте, что повторная отправка откладывается'
+        )
+        assert send_batch(max_attempts=2) == (0, 0)
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        assert send_batch(max_attempts=2) == (0, 1)
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.FAILED
@@ -0,0 +1,80 @@
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import add_user_claims
+
+
+def claims_client(user):
+    token = add_user_claims(AccessToken.for_user(user), user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+class Test14StatelessJWT:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_token_contains_claims(self, client, user):
+        from django.contrib.auth.tokens import default_token_generator
+        response = client.post('/api/v1/auth/token/', data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user)
+        })
+        assert response.status_code == 200
+        token = AccessToken(response.json()['access'])
+        assert token['username'] == user.username
+        assert token['role'] == user.role
+        assert token['token_version'] == user.token_version
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_no_user_lookup(self, admin, django_assert_num_queries):
+        admin_client = claims_client(admin)
+        # проверка версии токенов и загрузка профиля в самом эндпойнте,
+        # без отдельной загрузки пользователя при аутентификации
+        with django_assert_num_queries(2):
+            response = admin_client.get('/api/v1/users/me/')
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_role_change_revokes_tokens(self, admin, user):
+        admin_client = claims_client(admin)
+        moderator_client = claims_client(user)
+        response = moderator_client.get('/api/v1/users/me/')
+        assert response.status_code == 200
+        assert response.json()['username'] == user.username
+
+        response = admin_client.patch(f'/api/v1/users/{user.username}/',
+                                      data={'role': 'moderator'})
+        assert response.status_code == 200
+        response = moderator_client.get('/api/v1/users/me/')
+        assert response.status_code == 401, (
+            'Проверьте, что смена роли пользователя отзывает его токены'
+        )
+        user.refresh_from_db()
+        response = claims_client(user).get('/api/v1/users/me/')
+        assert response.json()['role'] == 'moderator'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_review_with_claims_user(self, admin, user):
+        admin_client = claims_client(admin)
+        admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'films'})
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Произведение', 'year': 2000, 'category': 'films', 'genre': []
+        })
+        title_id = response.json()['id']
+        user_client = claims_client(user)
+        response = user_client.post(f'/api/v1/titles/{title_id}/reviews/',
+                                    data={'text': 'Отзыв', 'score': 7})
+        assert response.status_code == 201
+        assert response.json()['author'] == user.username
+        review_id = response.json()['id']
+        response = user_client.patch(
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/', data={'score': 8}
+        )
+        assert response.status_code == 200, (
+            'Проверьте, что автор может изменить свой отзыв с токеном без загрузки пользователя'
+        )
+        response = user_client.post(f'/api/v1/titles/{title_id}/reviews/',
+                                    data={'text': 'Ещё отзыв', 'score': 7})
+        assert response.status_code == 400
@@ -0,0 +1,70 @@
+import pytest
+
+from .common import create_reviews
+
+
+class Test15ConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_list_etag(self, client, admin_client, admin,
+                                django_assert_max_num_queries):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert etag.startswith('"'), 'Проверьте, что ответ содержит строгий ETag'
+
+        with django_assert_max_num_queries(1):
+            response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что на If-None-Match с актуальным ETag возвращается 304'
+        )
+        assert response['ETag'] == etag
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/',
+            data={'score': 10}
+        )
+        response = client.get('/api/v1/titles/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что изменение отзыва (рейтинга) меняет ETag списка произведений'
+        )
+        assert response['ETag'] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_nested_lists_etag(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        admin_client.post(url, data={'text': 'Комментарий'})
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        url = '/api/v1/genres/'
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        detail_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        detail_etag = client.get(detail_url)['ETag']
+        admin_client.delete('/api/v1/genres/horror/')
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        assert client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code == 200, (
+            'Проверьте, что удаление жанра меняет ETag произведения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_genre_cleared_from_titles(self, client, admin_client, admin):
+        from reviews.models import Genre
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        title = titles[0]
+        genre = Genre.objects.get(slug=title['genre'][0])
+        detail_url = f'/api/v1/titles/{title["id"]}/'
+        etag = client.get(detail_url)['ETag']
+
+        genre.titles.clear()
+        response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что удаление всех произведений из жанра меняет '
+            'ETag каждого из них'
+        )
+        assert genre.slug not in [item['slug']
+                                  for item in response.json()['genre']]
@@ -0,0 +1,35 @@
+import pytest
+
+from .common import create_genre
+
+
+class Test16CatalogCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_genre_list_cache(self, client, admin_client,
+                                 django_assert_num_queries):
+        create_genre(admin_client)
+        response = client.get('/api/v1/genres/?search=Ужас')
+        assert response.status_code == 200
+        assert response.json()['count'] == 1
+
+        # только чтение версий, без запроса жанров и сериализации
+        with django_assert_num_queries(1):
+            cached = client.get('/api/v1/genres/?search=Ужас')
+        assert cached.json() == response.json()
+
+        admin_client.post('/api/v1/genres/', data={'name': 'Ужасы 2', 'slug': 'horror-2'})
+        response = client.get('/api/v1/genres/?search=Ужас')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что создание жанра сбрасывает кеш списка жанров'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_category_list_cache_invalidated_by_admin(self, client, admin_client):
+        from reviews.models import Category
+        admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'films'})
+        assert client.get('/api/v1/categories/').json()['count'] == 1
+        Category.objects.create(name='Книга', slug='books')
+        assert client.get('/api/v1/categories/').json()['count'] == 2
+        Category.objects.get(slug='books').delete()
+        assert client.get('/api/v1/categories/').json()['count'] == 1
@@ -0,0 +1,70 @@
+import pytest
+from django.core.management import call_command
+
+from .common import auth_client, create_reviews, create_titles
+
+
+class Test17Search:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_search_relevance(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Вечер', 'year': 2010, 'genre': ['drama'],
+            'category': 'films', 'description': 'Драма о проекте'
+        })
+
+        response = client.get('/api/v1/titles/?q=проект')
+        assert response.status_code == 200
+        names = [title['name'] for title in response.json()['results']]
+        assert names == ['Проект', 'Вечер'], (
+            'Проверьте, что `?q=` ищет по названию и описанию и что '
+            'совпадение в названии ранжируется выше'
+        )
+
+        response = client.get('/api/v1/titles/?q=крутое пик')
+        ids = [title['id'] for title in response.json()['results']]
+        assert ids == [titles[0]['id']], (
+            'Проверьте, что поиск учитывает все слова запроса и их префиксы'
+        )
+
+        response = client.get('/api/v1/titles/?q=проект&ordering=year')
+        names = [title['name'] for title in response.json()['results']]
+        assert names == ['Вечер', 'Проект'], (
+            'Проверьте, что явная сортировка `ordering` важнее релевантности'
+        )
+
+        response = client.get('/api/v1/titles/?q="*)(')
+        assert response.status_code == 200
+        assert response.json()['count'] == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_index_follows_changes(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/',
+                           data={'name': 'Затмение'})
+        assert client.get('/api/v1/titles/?q=проект').json()['count'] == 0
+        assert client.get('/api/v1/titles/?q=затмение').json()['count'] == 1
+
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        assert client.get('/api/v1/titles/?q=затмение').json()['count'] == 0
+
+        call_command('rebuild_search_index', stdout=None)
+        assert client.get('/api/v1/titles/?q=пике').json()['count'] == 1, (
+            'Проверьте, что команда rebuild_search_index перестраивает индекс'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_review_search(self, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        auth_client(user).patch(f'{url}{reviews[1]["id"]}/',
+                                data={'text': 'Страшно интересно'})
+
+        response = admin_client.get(f'{url}?q=страшн')
+        assert response.status_code == 200
+        ids = [review['id'] for review in response.json()['results']]
+        assert ids == [reviews[1]['id']], (
+            'Проверьте, что `?q=` ищет по тексту отзывов'
+        )
+        assert admin_client.get(f'{url}?q=qwerty321').json()['count'] == 1
@@ -0,0 +1,167 @@
+import pytest
+
+from .common import create_titles
+
+
+class Test18TitleSuggest:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_prefix_suggest(self, client, admin_client,
+                               django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Пёстрая лента', 'year': 1892, 'genre': ['drama'],
+            'category': 'books'
+        })
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Пестрые  сны', 'year': 2001, 'genre': ['drama'],
+            'category': 'books'
+        })
+
+        response = client.get('/api/v1/titles/suggest/?prefix=ПЕСТР')
+        assert response.status_code == 200
+        assert [title['name'] for title in response.json()] == [
+            'Пёстрая лента', 'Пестрые  сны'
+        ], (
+            'Проверьте, что `/api/v1/titles/suggest/` ищет по началу названия '
+            'без учёта регистра и различия ё/е'
+        )
+        assert set(response.json()[0]) == {'id', 'name', 'year'}
+
+        with django_assert_num_queries(0):
+            response = client.get('/api/v1/titles/suggest/?prefix=п&limit=2')
+        assert [title['name'] for title in response.json()] == [
+            'Пёстрая лента', 'Пестрые  сны'
+        ], (
+            'Проверьте, что подсказки берутся из индекса в памяти '
+            'и учитывают `limit`'
+        )
+
+        response = client.get('/api/v1/titles/suggest/?prefix=пестрые с')
+        assert len(response.json()) == 1
+        assert client.get('/api/v1/titles/suggest/?prefix=туда').json() == []
+
+        response = client.get('/api/v1/titles/suggest/')
+        assert response.status_code == 400
+        response = client.get('/api/v1/titles/suggest/?prefix=п&limit=1000')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_index_follows_writes(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        client.get('/api/v1/titles/suggest/?prefix=п')
+
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/',
+                           data={'name': 'Затмение'})
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Поход', 'year': 1999, 'genre': ['drama'],
+            'category': 'books'
+        })
+        response = client.get('/api/v1/titles/suggest/?prefix=п')
+        assert [title['name'] for title in response.json()] == ['Поход'], (
+            'Проверьте, что индекс подсказок обновляется при изменении, '
+            'удалении и создании произведений'
+        )
+        response = client.get('/api/v1/titles/suggest/?prefix=зат')
+        assert [title['id'] for title in response.json()] == [titles[1]['id']]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_refresh_on_catalog_version(self, client, admin_client,
+                                           settings):
+        from reviews import versions
+        from reviews.models import Title
+        titles, _, _ = create_titles(admin_client)
+        client.get('/api/v1/titles/suggest/?prefix=п')
+
+        # изменение из другого процесса: сигналы здесь не срабатывают
+        Title.objects.filter(pk=titles[1]['id']).update(name='Затмение')
+        versions.bump_versions(versions.CATALOG)
+        settings.CATALOG_INDEX_REFRESH_INTERVAL = 0
+
+        response = client.get('/api/v1/titles/suggest/?prefix=зат')
+        assert [title['id'] for title in response.json()] == [titles[1]['id']], (
+            'Проверьте, что индекс подсказок перестраивается при изменении '
+            'версии каталога'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_no_rebuild_after_local_writes(self, client, admin_client,
+                                              settings, monkeypatch):
+        from reviews import versions
+        from reviews.bitmaps import TitleBitmapIndex
+        from reviews.suggest import TitleSuggestIndex
+        titles, _, _ = create_titles(admin_client)
+        settings.CATALOG_INDEX_REFRESH_INTERVAL = 0
+        client.get('/api/v1/titles/suggest/?prefix=п')
+        client.get('/api/v1/titles/?genre=drama')
+        loads = []
+        for index_class in (TitleSuggestIndex, TitleBitmapIndex):
+            load = index_class._load
+
+            def counted(self, load=load):
+                loads.append(type(self))
+                return load(self)
+            monkeypatch.setattr(index_class, '_load', counted)
+
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Поход', 'year': 1999, 'genre': ['drama'],
+            'category': 'books'
+        })
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/',
+                           data={'name': 'Затмение', 'genre': ['comedy']})
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        response = client.get('/api/v1/titles/suggest/?prefix=п')
+        assert [title['name'] for title in response.json()] == ['Поход']
+        response = client.get('/api/v1/titles/?genre=comedy')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[1]['id']
+        ]
+        assert loads == [], (
+            'Проверьте, что изменения этого процесса не вызывают '
+            'перестройку индексов каталога'
+        )
+
+        versions.bump_versions(versions.CATALOG)
+        client.get('/api/v1/titles/suggest/?prefix=п')
+        client.get('/api/v1/titles/?genre=comedy')
+        assert sorted(map(str, loads)) == sorted(
+            map(str, [TitleSuggestIndex, TitleBitmapIndex])
+        ), 'Проверьте, что изменения других процессов перестраивают индексы'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_rebuild_does_not_block_reads(self, client, admin_client,
+                                             settings, monkeypatch):
+        import threading
+        from reviews import versions
+        from reviews.models import Title
+        from reviews.suggest import TitleSuggestIndex, title_suggest_index
+        titles, _, _ = create_titles(admin_client)
+        client.get('/api/v1/titles/suggest/?prefix=п')
+        Title.objects.filter(pk=titles[1]['id']).update(name='Затмение')
+        versions.bump_versions(versions.CATALOG)
+        settings.CATALOG_INDEX_REFRESH_INTERVAL = 0
+
+        during_build = []
+        load = TitleSuggestIndex._load
+
+        def slow_load(self):
+            # чтение из другого потока во время перестройки
+            thread = threading.Thread(target=lambda: during_build.append(
+                title_suggest_index.suggest('зат', 10)
+            ))
+            thread.start()
+            thread.join(timeout=5)
+            assert not thread.is_alive(), (
+                'Проверьте, что перестройка индекса подсказок не блокирует '
+                'чтение'
+            )
+            return load(self)
+        monkeypatch.setattr(TitleSuggestIndex, '_load', slow_load)
+
+        response = client.get('/api/v1/titles/suggest/?prefix=зат')
+        assert [title['id'] for title in response.json()] == [titles[1]['id']]
+        assert during_build == [[]], (
+            'Проверьте, что во время перестройки подсказки отдаются '
+            'из прежнего индекса'
+        )
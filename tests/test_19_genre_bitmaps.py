@@ -0,0 +1,135 @@
+import pytest
+
+from .common import create_titles
+
+
+def title_ids(response):
+    assert response.status_code == 200
+    return sorted(title['id'] for title in response.json()['results'])
+
+
+class Test19GenreBitmaps:
+
+    def create_catalog(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Туман', 'year': 2020, 'genre': ['horror', 'drama'],
+            'category': 'films'
+        })
+        return [title['id'] for title in titles] + [response.json()['id']]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_genre_modes(self, client, admin_client):
+        first, second, third = self.create_catalog(admin_client)
+
+        response = client.get('/api/v1/titles/?genre=horror,drama')
+        assert title_ids(response) == [first, second, third], (
+            'Проверьте, что `genre=a,b` возвращает произведения любого '
+            'из жанров'
+        )
+        response = client.get('/api/v1/titles/?genre=horror&genre=drama')
+        assert title_ids(response) == [first, second, third], (
+            'Проверьте, что повторяющийся параметр `genre` объединяет жанры'
+        )
+        response = client.get('/api/v1/titles/?genre=comedy&genre=horror,'
+                              'drama&genre_mode=all')
+        assert title_ids(response) == []
+        response = client.get('/api/v1/titles/?genre=horror,drama'
+                              '&genre_mode=all')
+        assert title_ids(response) == [third], (
+            'Проверьте, что `genre_mode=all` возвращает произведения '
+            'со всеми жанрами'
+        )
+        response = client.get('/api/v1/titles/?genre=horror'
+                              '&category=films&year=2020')
+        assert title_ids(response) == [third], (
+            'Проверьте, что фильтры по жанру, категории и году пересекаются'
+        )
+        response = client.get('/api/v1/titles/?genre=comedy,unknown')
+        assert title_ids(response) == [first]
+        response = client.get('/api/v1/titles/?genre=comedy,unknown'
+                              '&genre_mode=all')
+        assert title_ids(response) == []
+        response = client.get('/api/v1/titles/?genre_mode=some')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_index_follows_writes(self, client, admin_client):
+        first, second, third = self.create_catalog(admin_client)
+        assert title_ids(client.get('/api/v1/titles/?genre=comedy')) == [first]
+
+        admin_client.patch(f'/api/v1/titles/{second}/',
+                           data={'genre': ['comedy'], 'category': 'films'})
+        assert title_ids(client.get('/api/v1/titles/?genre=comedy')) == [
+            first, second
+        ], 'Проверьте, что индекс жанров обновляется при изменении произведения'
+        assert title_ids(client.get('/api/v1/titles/?genre=drama')) == [third]
+        assert title_ids(
+            client.get('/api/v1/titles/?category=films')
+        ) == [first, second, third]
+
+        admin_client.delete(f'/api/v1/titles/{first}/')
+        assert title_ids(client.get('/api/v1/titles/?genre=comedy')) == [second]
+
+        admin_client.delete('/api/v1/genres/comedy/')
+        assert title_ids(client.get('/api/v1/titles/?genre=comedy')) == [], (
+            'Проверьте, что удаление жанра учитывается индексом'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_genre_filter_without_join(self, client, admin_client,
+                                          django_assert_max_num_queries):
+        self.create_catalog(admin_client)
+        client.get('/api/v1/titles/?genre=horror')
+        # версии для ETag, COUNT, страница, жанры страницы
+        with django_assert_max_num_queries(4) as context:
+            response = client.get('/api/v1/titles/?genre=horror,drama'
+                                  '&genre_mode=all')
+        assert response.json()['count'] == 1
+        count_sql = context.captured_queries[1]['sql']
+        assert 'reviews_title_genre' not in count_sql, (
+            'Проверьте, что фильтр по жанрам не использует JOIN'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_genre_facets(self, client, admin_client):
+        self.create_catalog(admin_client)
+        response = client.get('/api/v1/titles/facets/')
+        assert response.status_code == 200
+        assert response.json()['genre'] == {
+            'comedy': 1, 'drama': 2, 'horror': 2
+        }, 'Проверьте, что `/api/v1/titles/facets/` считает произведения жанров'
+
+        response = client.get('/api/v1/titles/facets/?year=2020')
+        assert response.json()['genre'] == {
+            'comedy': 0, 'drama': 2, 'horror': 1
+        }, 'Проверьте, что счётчики жанров учитывают текущие фильтры'
+
+        response = client.get('/api/v1/titles/facets/?name=Проект')
+        assert response.json()['genre'] == {
+            'comedy': 0, 'drama': 1, 'horror': 0
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_writes_from_other_processes(self, client, admin_client):
+        from reviews import versions
+        from reviews.models import Genre, Title
+        first, second, third = self.create_catalog(admin_client)
+        response = client.get('/api/v1/titles/?genre=drama')
+        assert title_ids(response) == [second, third]
+        etag = response['ETag']
+
+        # запись другого процесса: сигналы этого процесса не срабатывают
+        Title.genre.through.objects.bulk_create([Title.genre.through(
+            title_id=first, genre_id=Genre.objects.get(slug='drama').id
+        )])
+        Title.objects.filter(pk=third).update(year=1990)
+        versions.bump_versions(versions.CATALOG, versions.TITLES)
+
+        response = client.get('/api/v1/titles/?genre=drama')
+        assert title_ids(response) == [first, second, third], (
+            'Проверьте, что фильтр по жанрам сверяет индекс в памяти '
+            'с версией каталога запроса'
+        )
+        assert response['ETag'] != etag
+        assert title_ids(client.get('/api/v1/titles/?decade=1990')) == [third]
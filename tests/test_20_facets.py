@@ -0,0 +1,94 @@
+import pytest
+
+from .common import auth_client, create_titles, create_users_api
+
+
+class Test20Facets:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_all_facets(self, client, admin_client):
+        create_titles(admin_client)
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Туман', 'year': 2024, 'genre': ['horror', 'drama'],
+            'category': 'films'
+        })
+
+        response = client.get('/api/v1/titles/facets/')
+        assert response.status_code == 200
+        assert response.json() == {
+            'genre': {'comedy': 1, 'drama': 2, 'horror': 2},
+            'category': {'books': 1, 'films': 2},
+            'decade': {'2000': 1, '2020': 2},
+        }, (
+            'Проверьте, что `/api/v1/titles/facets/` возвращает счётчики '
+            'по жанрам, категориям и десятилетиям'
+        )
+
+        response = client.get('/api/v1/titles/facets/?genre=drama')
+        assert response.json() == {
+            'genre': {'comedy': 0, 'drama': 2, 'horror': 1},
+            'category': {'books': 1, 'films': 1},
+            'decade': {'2000': 0, '2020': 2},
+        }, 'Проверьте, что счётчики учитывают фильтры списка'
+
+        response = client.get('/api/v1/titles/?decade=2020')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что `/api/v1/titles/` поддерживает фильтр `decade`'
+        )
+        response = client.get('/api/v1/titles/facets/?year=abc')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_facets_cache(self, client, admin_client,
+                             django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/facets/?rating_min=1')
+        assert response.json()['genre']['drama'] == 0
+
+        # только чтение версий
+        with django_assert_num_queries(1):
+            cached = client.get('/api/v1/titles/facets/?rating_min=1')
+        assert cached.json() == response.json()
+        response = client.get('/api/v1/titles/facets/?rating_min=1',
+                              HTTP_IF_NONE_MATCH=cached['ETag'])
+        assert response.status_code == 304, (
+            'Проверьте, что `/api/v1/titles/facets/` поддерживает If-None-Match'
+        )
+
+        user, _ = create_users_api(admin_client)
+        auth_client(user).post(f'/api/v1/titles/{titles[1]["id"]}/reviews/',
+                               data={'text': 'Хорошо', 'score': 7})
+        response = client.get('/api/v1/titles/facets/?rating_min=1')
+        assert response.json()['genre']['drama'] == 1, (
+            'Проверьте, что кеш фасетов с фильтром по рейтингу сбрасывается '
+            'при новых оценках'
+        )
+
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/',
+                           data={'genre': ['comedy'], 'category': 'books'})
+        response = client.get('/api/v1/titles/facets/')
+        assert response.json()['genre']['comedy'] == 2, (
+            'Проверьте, что кеш фасетов сбрасывается при изменении каталога'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_facets_after_other_process_writes(self, client,
+                                                  admin_client):
+        from reviews import versions
+        from reviews.models import Genre, Title
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/facets/')
+        assert response.json()['genre']['drama'] == 1
+
+        # запись другого процесса: сигналы этого процесса не срабатывают
+        Title.genre.through.objects.bulk_create([Title.genre.through(
+            title_id=titles[0]['id'],
+            genre_id=Genre.objects.get(slug='drama').id
+        )])
+        versions.bump_versions(versions.CATALOG, versions.TITLES)
+        for _ in range(2):
+            response = client.get('/api/v1/titles/facets/')
+            assert response.json()['genre']['drama'] == 2, (
+                'Проверьте, что счётчики не берутся из устаревшего индекса '
+                'и не кешируются под новой версией каталога'
+            )
@@ -0,0 +1,48 @@
+import pytest
+
+
+class Test21Benchmark:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_run_benchmark(self):
+        from api.benchmark import (ENDPOINTS, compare_renderers,
+                                   run_benchmark, seed)
+        from reviews.models import Comment, Review
+        seed(300)
+        assert 100 < Review.objects.count() < 600
+        assert Comment.objects.exists()
+
+        results = run_benchmark(repeat=2)
+        assert set(results) == {endpoint.name for endpoint in ENDPOINTS}
+        for name, metrics in results.items():
+            assert metrics['errors'] == 0, (
+                f'Проверьте, что замеряемый запрос `{name}` выполняется без ошибок'
+            )
+            assert metrics['p50_ms'] <= metrics['p95_ms'] <= metrics['max_ms']
+            assert metrics['peak_memory_kb'] > 0
+        assert results['titles-suggest']['queries'] == 0
+        assert results['titles-list']['queries'] > 0
+
+        renderers = compare_renderers(repeat=2)
+        assert set(renderers) == {'titles-list', 'reviews-list'}
+        assert all(timings['speedup'] > 0 for timings in renderers.values())
+
+    def test_02_compare_results(self):
+        from api.benchmark import compare_results, format_report, percentile
+        assert percentile([5, 1, 3, 2, 4], 50) == 3
+        assert percentile([5, 1, 3, 2, 4], 95) == 5
+
+        metrics = {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4,
+                   'peak_memory_kb': 100.0}
+        baseline = {'results': {'1000': {'titles-list': metrics}}}
+        current = {'results': {'1000': {
+            'titles-list': dict(metrics, p95_ms=30.0, queries=5),
+            'new-endpoint': metrics,
+        }}}
+        comparisons = compare_results(baseline, current, threshold=0.2)
+        regressions = {item.metric for item in comparisons if item.regression}
+        assert regressions == {'p95_ms', 'queries'}, (
+            'Проверьте, что регрессией считается рост задержки выше порога '
+            'и любой рост числа запросов'
+        )
+        assert 'РЕГРЕССИЯ' in format_report(comparisons)
@@ -0,0 +1,57 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+
+from reviews.models import Comment, Review, Title, User
+from reviews.ratings import recalculate_ratings
+
+
+def generate(*args):
+    call_command('generate_data', '--users', '30', '--titles', '40',
+                 '--reviews-per-title', 'zipf:1.2:25',
+                 '--comments-per-review', 'uniform:0:2', '--genres', '4',
+                 '--categories', '2', '--chunk-size', '50', *args,
+                 stdout=StringIO())
+
+
+class Test22GenerateData:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_generate_data(self):
+        generate()
+        assert User.objects.count() == 30
+        assert Title.objects.count() == 40
+        assert Review.objects.exists() and Comment.objects.exists()
+        assert not (Review.objects.values('title', 'author')
+                    .annotate(count=Count('id')).filter(count__gt=1)
+                    .exists()), (
+            'Проверьте, что `generate_data` не создаёт повторных отзывов '
+            'автора на произведение'
+        )
+        assert recalculate_ratings() == 0, (
+            'Проверьте, что `generate_data` сохраняет агрегаты оценок '
+            'произведений'
+        )
+        counts = sorted(Title.objects.order_by().annotate(count=Count('reviews'))
+                        .values_list('count', flat=True))
+        assert counts[-1] > 3 * counts[len(counts) // 2], (
+            'Проверьте, что популярность произведений неравномерна'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_append_and_workers(self):
+        generate()
+        reviews = Review.objects.count()
+        generate('--workers', '2')
+        assert Title.objects.count() == 80
+        assert Review.objects.count() == 2 * reviews, (
+            'Проверьте, что данные не зависят от числа процессов и '
+            'добавляются к существующим'
+        )
+        assert Title.genre.through.objects.values('genre').distinct().count() == 4
+
+    def test_03_invalid_distribution(self):
+        with pytest.raises(CommandError):
+            generate('--reviews-per-title', 'zipf:abc')
@@ -0,0 +1,102 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .common import create_titles
+
+
+def metric_value(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(
+        rf'^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$', text, re.M
+    )
+    assert match, f'Не найдена метрика {name}{{{label_text}}} в `/metrics`'
+    return float(match.group(1))
+
+
+class Test23Metrics:
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self, settings):
+        from api.metrics import metrics_registry
+        # метрики выключены по умолчанию
+        settings.METRICS_ENABLED = True
+        metrics_registry.reset()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_route_metrics(self, client, admin_client):
+        create_titles(admin_client)
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/v1/titles/')
+        # request_started очищает журнал запросов, поэтому число
+        # запоминается до следующего запроса
+        query_count = len(queries)
+        client.get('/api/v1/titles/')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.content.decode()
+        labels = {'route': 'titles-list', 'method': 'GET'}
+        assert metric_value(
+            text, 'yamdb_db_queries_per_request_sum', **labels
+        ) == 2 * query_count, (
+            'Проверьте, что метрики считают запросы к БД по маршрутам'
+        )
+        assert metric_value(
+            text, 'yamdb_http_request_duration_seconds_count', **labels
+        ) == 2
+        assert metric_value(
+            text, 'yamdb_http_request_duration_seconds_bucket', **labels,
+            le='+Inf'
+        ) == 2
+        assert metric_value(
+            text, 'yamdb_serializer_duration_seconds_sum', **labels
+        ) > 0, 'Проверьте, что метрики учитывают время сериализации'
+        assert metric_value(
+            text, 'yamdb_serializer_duration_seconds_sum',
+            route='titles-list', method='POST'
+        ) > 0, 'Проверьте, что метрики учитывают время валидации'
+        assert metric_value(
+            text, 'yamdb_http_requests_total', **labels, status=200
+        ) == 2
+        assert metric_value(
+            text, 'yamdb_http_requests_total', route='titles-list',
+            method='POST', status=201
+        ) == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_unresolved_and_methods(self, client):
+        client.get('/api/v1/unknown/')
+        client.generic('BREW', '/api/v1/titles/')
+        text = client.get('/metrics').content.decode()
+        assert metric_value(
+            text, 'yamdb_http_requests_total', route='unresolved',
+            method='GET', status=404
+        ) == 1
+        assert 'method="BREW"' not in text, (
+            'Проверьте, что неизвестные методы HTTP не попадают в метки'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_settings(self, client, settings):
+        from django.test import Client
+        from api.metrics import metrics_registry
+
+        settings.METRICS_TOKEN = 'secret'
+        assert client.get('/metrics').status_code == 401
+        response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
+
+        settings.METRICS_ENABLED = False
+        # middleware загружается при первом запросе клиента
+        client = Client()
+        client.get('/api/v1/titles/')
+        assert client.get('/metrics').status_code == 404, (
+            'Проверьте, что METRICS_ENABLED = False отключает `/metrics`'
+        )
+        assert 'route="titles-list"' not in metrics_registry.render(), (
+            'Проверьте, что METRICS_ENABLED = False отключает middleware'
+        )
@@ -0,0 +1,64 @@
+import pstats
+import re
+
+import pytest
+
+from .common import create_titles
+
+
+class Test24Profiling:
+
+    @pytest.fixture(autouse=True)
+    def profiling_dir(self, settings, tmp_path):
+        settings.PROFILING_DIR = str(tmp_path / 'profiles')
+        return tmp_path / 'profiles'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_cprofile(self, admin_client, profiling_dir):
+        create_titles(admin_client)
+        response = admin_client.get('/api/v1/titles/',
+                                    HTTP_X_PROFILE='cprofile')
+        assert response.status_code == 200
+        timing = response['Server-Timing']
+        assert re.match(
+            r'total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", '
+            r'serializer;dur=[\d.]+, profile;desc="[^"]+\.prof"$', timing
+        ), 'Проверьте заголовок Server-Timing профилированного запроса'
+        files = list(profiling_dir.iterdir())
+        assert len(files) == 1
+        assert files[0].name in timing
+        assert 'titles-list-GET' in files[0].name
+        stats = pstats.Stats(str(files[0]))
+        assert stats.total_calls > 0, 'Проверьте, что профиль записан в pstats'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_sampling(self, admin_client, profiling_dir, settings):
+        settings.PROFILING_SAMPLE_INTERVAL = 0.0001
+        create_titles(admin_client)
+        response = admin_client.get('/api/v1/titles/',
+                                    HTTP_X_PROFILE='sample')
+        assert '.folded' in response['Server-Timing']
+        files = list(profiling_dir.iterdir())
+        assert len(files) == 1
+        for line in files[0].read_text(encoding='utf-8').splitlines():
+            assert re.match(r'^\S+(;\S+)* \d+$', line), (
+                'Проверьте, что стеки записаны в формате collapsed stacks'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_only_admins(self, client, user_client, admin_client,
+                            profiling_dir):
+        for request_client in (client, user_client):
+            response = request_client.get('/api/v1/titles/',
+                                          HTTP_X_PROFILE='cprofile')
+            assert response.status_code == 200
+            assert not response.has_header('Server-Timing'), (
+                'Проверьте, что профилировать запросы могут только '
+                'администраторы'
+            )
+        response = admin_client.get('/api/v1/titles/')
+        assert not response.has_header('Server-Timing')
+        response = admin_client.get('/api/v1/titles/',
+                                    HTTP_X_PROFILE='unknown')
+        assert not response.has_header('Server-Timing')
+        assert not profiling_dir.exists()
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from .common import create_titles
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+class Test25SlowQueries:
+
+    @pytest.fixture(autouse=True)
+    def slow_query_log(self, settings, tmp_path):
+        settings.SLOW_QUERY_LOG = str(tmp_path / 'logs' / 'slow.log')
+        return tmp_path / 'logs' / 'slow.log'
+
+    def test_01_normalize_sql(self):
+        from api.slow_queries import fingerprint, normalize_sql
+        first = normalize_sql(
+            'SELECT "t"."id" FROM "t"  WHERE "t"."id" IN (%s, %s, %s) '
+            "AND \"t\".\"name\" = 'a''b' LIMIT 21"
+        )
+        assert first == ('SELECT "t"."id" FROM "t" WHERE "t"."id" IN (...) '
+                         'AND "t"."name" = ? LIMIT ?'), (
+            'Проверьте, что значения в SQL заменяются на ?'
+        )
+        second = normalize_sql(
+            'SELECT "t"."id" FROM "t" WHERE "t"."id" IN (%s, %s) '
+            "AND \"t\".\"name\" = 'c' LIMIT 10"
+        )
+        assert fingerprint(first) == fingerprint(second)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_log_with_plan(self, client, admin_client, settings,
+                              slow_query_log):
+        create_titles(admin_client)
+        assert not slow_query_log.exists(), (
+            'Проверьте, что запросы быстрее порога не записываются'
+        )
+        settings.SLOW_QUERY_THRESHOLD_MS = 0
+        client.get('/api/v1/titles/')
+        records = [record for record in read_records(slow_query_log)
+                   if record['view'] == 'titles-list'
+                   and '"reviews_title"' in record['sql']]
+        assert records, (
+            'Проверьте, что медленные запросы записываются в журнал '
+            'с именем view'
+        )
+        record = records[0]
+        assert record['method'] == 'GET'
+        assert record['path'] == '/api/v1/titles/'
+        assert '%s' not in record['sql']
+        assert isinstance(record['params'], list)
+        assert record['plan'] and any(
+            'SCAN' in line or 'SEARCH' in line for line in record['plan']
+        ), 'Проверьте, что для медленного запроса сохраняется EXPLAIN'
+        assert record['duration_ms'] >= 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_report(self, client, admin_client, settings,
+                       slow_query_log):
+        settings.SLOW_QUERY_THRESHOLD_MS = 0
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/genres/')
+        client.get('/api/v1/categories/')
+
+        out = StringIO()
+        call_command('slow_query_report', json=True, view='genre-list',
+                     stdout=out)
+        groups = json.loads(out.getvalue())
+        assert groups, 'Проверьте сводку `slow_query_report`'
+        assert all(group['views'] == ['genre-list'] for group in groups)
+        assert max(group['count'] for group in groups) == 2, (
+            'Проверьте, что одинаковые запросы группируются'
+        )
+
+        out = StringIO()
+        call_command('slow_query_report', top=1, stdout=out)
+        text = out.getvalue()
+        assert 'SQL: ' in text and 'план: ' in text
@@ -0,0 +1,161 @@
+import pytest
+
+from api.query_budget import QueryBudgetExceeded
+from api.urls import router_v1
+from api.views import ReviewViewSet
+from reviews.generator import DataGenerator, Distribution
+from reviews.models import Comment, Review, Title, User
+
+
+def seed():
+    # Не меньше страницы (10) отзывов и комментариев у каждого родителя,
+    # чтобы N+1 на странице был заметен
+    DataGenerator(
+        users=30, titles=15,
+        reviews_per_title=Distribution('uniform:12:15'),
+        comments_per_review=Distribution('uniform:11:12'),
+        genres=4, categories=3, chunk_size=500,
+    ).run()
+
+
+@pytest.fixture
+def dataset(db):
+    from api.benchmark import jwt_client
+    seed()
+    admin = User.objects.create_user(username='budget-admin',
+                                      email='budget-admin@yamdb.fake',
+                                      role=User.ADMINISTRATOR)
+    title = Title.objects.order_by('id').first()
+    review = Review.objects.filter(title=title).order_by('id').first()
+    author = review.author
+    comment = Comment.objects.filter(review=review).order_by('id').first()
+    fresh_user = User.objects.create_user(username='budget-user',
+                                          email='budget-user@yamdb.fake')
+    return {
+        'admin': jwt_client(admin),
+        'author': jwt_client(comment.author),
+        'review_author': jwt_client(author),
+        'user': jwt_client(fresh_user),
+        'title': title,
+        'review': review,
+        'comment': comment,
+    }
+
+
+CASES = (
+    ('user', 'get', '/api/v1/titles/', None, 200),
+    ('user', 'get', '/api/v1/titles/?genre={genre}&ordering=-rating', None,
+     200),
+    ('user', 'get', '/api/v1/titles/?q=описание', None, 200),
+    ('user', 'get', '/api/v1/titles/?pagination=cursor', None, 200),
+    ('user', 'get', '/api/v1/titles/{title}/', None, 200),
+    ('user', 'get', '/api/v1/titles/{title}/?expand=reviews.comments', None,
+     200),
+    ('user', 'get', '/api/v1/titles/suggest/?prefix=а', None, 200),
+    ('user', 'get', '/api/v1/titles/facets/', None, 200),
+    ('admin', 'post', '/api/v1/titles/',
+     {'name': 'Новое', 'year': 2001, 'genre': ['generated-genre-1'],
+      'category': 'generated-category-1'}, 201),
+    ('admin', 'post', '/api/v1/titles/',
+     {'name': 'Все жанры', 'year': 2002,
+      'genre': [f'generated-genre-{number}' for number in range(4)],
+      'category': 'generated-category-1'}, 201),
+    ('admin', 'patch', '/api/v1/titles/{title}/',
+     {'genre': ['generated-genre-0', 'generated-genre-3'],
+      'category': 'generated-category-0', 'year': 1999}, 200),
+    ('admin', 'patch', '/api/v1/titles/{title}/', {'name': 'Другое'}, 200),
+    ('user', 'get', '/api/v1/titles/{title}/reviews/', None, 200),
+    ('user', 'get', '/api/v1/titles/{title}/reviews/{review}/', None, 200),
+    ('user', 'post', '/api/v1/titles/{title}/reviews/',
+     {'text': 'Отзыв', 'score': 5}, 201),
+    ('review_author', 'patch', '/api/v1/titles/{title}/reviews/{review}/',
+     {'score': 9}, 200),
+    ('user', 'get', '/api/v1/titles/{title}/reviews/{review}/comments/',
+     None, 200),
+    ('user', 'get',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/', None,
+     200),
+    ('user', 'post', '/api/v1/titles/{title}/reviews/{review}/comments/',
+     {'text': 'Комментарий'}, 201),
+    ('author', 'patch',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+     {'text': 'Исправленный'}, 200),
+    ('user', 'get', '/api/v1/genres/', None, 200),
+    ('admin', 'post', '/api/v1/genres/', {'name': 'Жанр', 'slug': 'g'}, 201),
+    ('user', 'get', '/api/v1/categories/', None, 200),
+    ('admin', 'post', '/api/v1/categories/', {'name': 'Кат', 'slug': 'c'},
+     201),
+    ('admin', 'get', '/api/v1/users/', None, 200),
+    ('admin', 'get', '/api/v1/users/budget-user/', None, 200),
+    ('admin', 'post', '/api/v1/users/',
+     {'username': 'budget-new', 'email': 'budget-new@yamdb.fake'}, 201),
+    ('admin', 'patch', '/api/v1/users/budget-user/', {'bio': 'Новое'}, 200),
+    ('user', 'get', '/api/v1/users/me/', None, 200),
+    ('user', 'patch', '/api/v1/users/me/', {'bio': 'О себе'}, 200),
+    ('author', 'delete',
+     '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/', None,
+     204),
+    ('review_author', 'delete', '/api/v1/titles/{title}/reviews/{review}/',
+     None, 204),
+    ('admin', 'delete', '/api/v1/genres/g/', None, 204),
+    ('admin', 'delete', '/api/v1/categories/c/', None, 204),
+    ('admin', 'delete', '/api/v1/users/budget-new/', None, 204),
+    ('admin', 'delete', '/api/v1/titles/{title}/', None, 204),
+)
+
+
+class Test26QueryBudgets:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_budgets(self, dataset):
+        urls = {
+            'title': dataset['title'].id,
+            'review': dataset['review'].id,
+            'comment': dataset['comment'].id,
+            'genre': 'generated-genre-1,generated-genre-2',
+        }
+        for role, method, url, data, status in CASES:
+            url = url.format(**urls)
+            # Превышение бюджета или N+1 вызывает QueryBudgetExceeded
+            response = getattr(dataset[role], method)(url, data=data,
+                                                      format='json')
+            assert response.status_code == status, (
+                f'{method.upper()} {url}: {response.status_code} '
+                f'{response.content[:200]}'
+            )
+
+    def test_02_every_viewset_has_budget(self):
+        for prefix, viewset, _ in router_v1.registry:
+            assert viewset.max_queries is not None, (
+                f'Укажите бюджет запросов max_queries для {viewset.__name__}'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_budget_exceeded(self, dataset, monkeypatch):
+        monkeypatch.setattr(ReviewViewSet, 'max_queries', 2)
+        with pytest.raises(QueryBudgetExceeded, match='при бюджете 2'):
+            dataset['user'].get(
+                f'/api/v1/titles/{dataset["title"].id}/reviews/'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_n_plus_one(self, dataset, monkeypatch, settings, caplog):
+        def get_queryset(self):
+            return Review.objects.filter(title_id=self.kwargs['title_id'])
+
+        monkeypatch.setattr(ReviewViewSet, 'get_queryset', get_queryset)
+        monkeypatch.setattr(ReviewViewSet, 'max_queries', None)
+        # Без select_related автор загружается запросом на каждый отзыв
+        # только при сериализации объектов
+        settings.READ_PROJECTIONS_ENABLED = False
+        url = f'/api/v1/titles/{dataset["title"].id}/reviews/'
+        with pytest.raises(QueryBudgetExceeded, match='N\\+1: 10 раз'):
+            dataset['user'].get(url)
+
+        settings.QUERY_BUDGET_RAISE = False
+        with caplog.at_level('WARNING', logger='api.query_budget'):
+            response = dataset['user'].get(url)
+        assert response.status_code == 200 and 'N+1' in caplog.text, (
+            'Проверьте, что вне тестов нарушения бюджета только '
+            'записываются в журнал'
+        )
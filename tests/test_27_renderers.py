@@ -0,0 +1,76 @@
+import datetime
+import decimal
+from collections import OrderedDict
+
+import pytest
+from django.utils import timezone
+from django.utils.functional import lazy
+from rest_framework.renderers import JSONRenderer
+
+from .common import create_reviews
+
+
+class Test27Renderers:
+
+    def test_01_same_output(self):
+        from api.renderers import FastJSONRenderer, FastJSONParser
+        moscow = datetime.timezone(datetime.timedelta(hours=3))
+        data = OrderedDict([
+            ('utc', datetime.datetime(2021, 5, 1, 12, 30, tzinfo=timezone.utc)),
+            ('micro', datetime.datetime(2021, 5, 1, 12, 30, 0, 123456,
+                                        tzinfo=timezone.utc)),
+            ('moscow', datetime.datetime(2021, 5, 1, 12, 30, tzinfo=moscow)),
+            ('naive', datetime.datetime(2021, 5, 1, 12, 30)),
+            ('date', datetime.date(2021, 5, 1)),
+            ('decimal', decimal.Decimal('7.5')),
+            ('lazy', lazy(lambda: 'ленивая строка', str)()),
+            ('keys', {2000: 1, 2010: 2}),
+            ('separators', 'a\u2028b\u2029c'),
+            ('nested', [{'rating': 7.25, 'genre': [], 'none': None}]),
+            ('unicode', 'Произведение "в кавычках"'),
+        ])
+        expected = JSONRenderer().render(data)
+        assert FastJSONRenderer().render(data) == expected, (
+            'Проверьте, что FastJSONRenderer выводит то же, что JSONRenderer'
+        )
+        assert FastJSONRenderer().render(
+            data, 'application/json; indent=4'
+        ) == JSONRenderer().render(data, 'application/json; indent=4')
+        assert FastJSONRenderer().render(None) == b''
+        assert FastJSONRenderer().render({'big': 2 ** 70}) == b'{"big":' + (
+            str(2 ** 70).encode() + b'}'
+        )
+
+        from io import BytesIO
+        parsed = FastJSONParser().parse(BytesIO(expected))
+        assert parsed['unicode'] == data['unicode']
+        assert parsed['keys'] == {'2000': 1, '2010': 2}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_api_responses(self, client, admin_client, admin):
+        create_reviews(admin_client, admin)
+        title = admin_client.get('/api/v1/titles/').json()['results'][-1]
+        for url in ('/api/v1/titles/',
+                    f'/api/v1/titles/{title["id"]}/reviews/'):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.content == JSONRenderer().render(response.data), (
+                f'Проверьте, что ответ `{url}` не изменился после замены '
+                'рендерера'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_parser(self, admin_client):
+        response = admin_client.post(
+            '/api/v1/genres/', data='{"name": "Жанр", "slug": "genre"}',
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+        assert response.json() == {'name': 'Жанр', 'slug': 'genre'}
+        response = admin_client.post(
+            '/api/v1/genres/', data='{"name": ', content_type='application/json'
+        )
+        assert response.status_code == 400, (
+            'Проверьте, что некорректный JSON возвращает 400'
+        )
+        assert response.json()['detail'].startswith('JSON parse error')
@@ -0,0 +1,127 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.permissions import IsOwner
+from api.projections import (CommentProjection, ProjectionObject,
+                             ReviewProjection, TitleProjection)
+from api.serializers import (CommentSerializer, ReviewSerializer,
+                             TitleSerializer)
+from api.views import CommentViewSet, ReviewViewSet, TitleViewSet
+from reviews.generator import DataGenerator, Distribution
+from reviews.models import Comment, Review, Title, User
+
+
+@pytest.fixture
+def dataset(db):
+    DataGenerator(
+        users=10, titles=12,
+        reviews_per_title=Distribution('uniform:0:12'),
+        comments_per_review=Distribution('uniform:0:3'),
+        genres=4, categories=3, chunk_size=500,
+    ).run()
+    # Крайние случаи: без категории, жанров, описания и отзывов
+    Title.objects.create(name='Пустое произведение', year=1999)
+    comment = Comment.objects.order_by('id').first()
+    return {'title': comment.review.title_id, 'review': comment.review_id,
+            'comment': comment.id}
+
+
+URLS = (
+    '/api/v1/titles/',
+    '/api/v1/titles/?page=2',
+    '/api/v1/titles/?ordering=-rating',
+    '/api/v1/titles/?genre=generated-genre-1&ordering=year',
+    '/api/v1/titles/?q=произведение',
+    '/api/v1/titles/?pagination=cursor',
+    '/api/v1/titles/{title}/',
+    '/api/v1/titles/100500/',
+    '/api/v1/titles/{title}/reviews/',
+    '/api/v1/titles/{title}/reviews/?pagination=cursor',
+    '/api/v1/titles/{title}/reviews/{review}/',
+    '/api/v1/titles/{title}/reviews/100500/',
+    '/api/v1/titles/{title}/reviews/{review}/comments/',
+    '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+)
+
+
+class Test28Projections:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_contract(self, dataset):
+        cases = (
+            (TitleProjection, TitleSerializer,
+             TitleViewSet.queryset.with_rating().order_by('id')),
+            (ReviewProjection, ReviewSerializer,
+             Review.objects.select_related('author').order_by('id')),
+            (CommentProjection, CommentSerializer,
+             Comment.objects.select_related('author').order_by('id')),
+        )
+        for projection_class, serializer_class, queryset in cases:
+            projection = projection_class()
+            assert projection.represent(projection.values(queryset)) == (
+                serializer_class(queryset, many=True).data
+            ), (
+                f'Проверьте, что {projection_class.__name__} отдаёт то же, '
+                f'что {serializer_class.__name__}'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_same_responses(self, dataset, settings):
+        client = APIClient()
+        for url in URLS:
+            url = url.format(**dataset)
+            settings.READ_PROJECTIONS_ENABLED = False
+            expected = client.get(url)
+            settings.READ_PROJECTIONS_ENABLED = True
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+                query_count = len(queries)
+            assert response.status_code == expected.status_code, url
+            assert response.content == expected.content, (
+                f'Проверьте, что ответ `{url}` без сериализаторов '
+                'не изменился'
+            )
+            assert response.get('ETag') == expected.get('ETag'), url
+            assert query_count <= 10, url
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_only_needed_columns(self, dataset):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/v1/titles/')
+            sql = [query['sql'] for query in queries]
+        assert response.status_code == 200
+        titles = [query for query in sql if 'FROM "reviews_title"' in query
+                  and '"reviews_title"."score_sum",' in query]
+        assert not titles, (
+            'Проверьте, что список произведений не выбирает колонки, '
+            'которых нет в ответе'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_object_permissions_without_object(self, dataset):
+        users = (AnonymousUser(), User.objects.order_by('id').first())
+        for view_class in (TitleViewSet, ReviewViewSet, CommentViewSet):
+            view = view_class()
+            for user in users:
+                request = APIRequestFactory().get('/')
+                request.user = user
+                for permission in view.get_permissions():
+                    assert permission.has_object_permission(
+                        request, view, ProjectionObject(view)
+                    ), (
+                        f'Проверьте, что права на объект '
+                        f'{view_class.__name__} разрешают чтение, не '
+                        'обращаясь к объекту: retrieve '
+                        'через проекции не загружает экземпляр модели'
+                    )
+
+        request = APIRequestFactory().get('/')
+        request.user = users[1]
+        with pytest.raises(ImproperlyConfigured):
+            IsOwner().has_object_permission(
+                request, ReviewViewSet(), ProjectionObject(ReviewViewSet())
+            )
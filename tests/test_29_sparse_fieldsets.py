@@ -0,0 +1,106 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .common import create_comments
+
+
+def get_with_sql(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+        sql = [query['sql'] for query in queries]
+    return response, sql
+
+
+class Test29SparseFieldsets:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('projections', (True, False))
+    def test_01_titles(self, client, admin_client, admin, settings,
+                       projections):
+        _, _, titles, _, _ = create_comments(admin_client, admin)
+        settings.READ_PROJECTIONS_ENABLED = projections
+
+        response, sql = get_with_sql(client,
+                                     '/api/v1/titles/?fields=id,name,rating')
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert [list(title) for title in results] == [
+            ['id', 'name', 'rating']
+        ] * len(titles), 'Проверьте, что ?fields= оставляет только эти поля'
+        assert results[-1]['rating'] == 4.0
+        sql = '\n'.join(sql)
+        assert '"description"' not in sql and 'reviews_category' not in sql, (
+            'Проверьте, что ненужные колонки и связи не выбираются из БД'
+        )
+        assert 'reviews_title_genre' not in sql, (
+            'Проверьте, что жанры не загружаются, если их нет в ответе'
+        )
+
+        response, sql = get_with_sql(
+            client, f'/api/v1/titles/{titles[0]["id"]}/?omit=rating,genre'
+        )
+        assert list(response.json()) == ['id', 'name', 'year', 'description',
+                                         'category']
+        assert not any('score_sum' in query for query in sql), (
+            'Проверьте, что рейтинг не вычисляется, если его нет в ответе'
+        )
+
+        response = client.get('/api/v1/titles/?fields=id&ordering=-rating')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id'], titles[1]['id']
+        ], 'Проверьте, что сортировка по рейтингу работает без поля rating'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_and_comments(self, client, admin_client, admin):
+        _, reviews, titles, _, moderator = create_comments(admin_client,
+                                                           admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        response, sql = get_with_sql(client, url + '?fields=id,score')
+        assert response.json()['results'][0] == {'id': reviews[2]['id'],
+                                                 'score': 4}
+        assert not any('reviews_user' in query for query in sql), (
+            'Проверьте, что автор не загружается, если его нет в ответе'
+        )
+        response = client.get(
+            f'{url}{reviews[0]["id"]}/comments/?omit=id,pub_date'
+        )
+        assert response.json()['results'][0] == {
+            'text': 'qwerty321', 'author': moderator.username
+        }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_other_viewsets(self, admin_client, admin, settings):
+        settings.READ_PROJECTIONS_ENABLED = False
+        response, sql = get_with_sql(admin_client,
+                                     '/api/v1/users/?fields=username,role')
+        assert response.json()['results'] == [{'username': admin.username,
+                                               'role': 'admin'}]
+        # Последний запрос - страница списка (первый - пользователь токена)
+        assert '"bio"' not in sql[-1] and '"username"' in sql[-1], (
+            'Проверьте, что выбираются только колонки запрошенных полей'
+        )
+        response = admin_client.get(
+            f'/api/v1/users/{admin.username}/?omit=bio,first_name,last_name'
+        )
+        assert list(response.json()) == ['username', 'email', 'role']
+
+        admin_client.post('/api/v1/genres/', data={'name': 'Жанр',
+                                                   'slug': 'genre'})
+        response = admin_client.get('/api/v1/genres/?fields=slug')
+        assert response.json()['results'] == [{'slug': 'genre'}]
+        response = admin_client.post('/api/v1/categories/?fields=slug',
+                                     data={'name': 'Кат', 'slug': 'cat'})
+        assert response.json() == {'name': 'Кат', 'slug': 'cat'}, (
+            'Проверьте, что ?fields= не влияет на ответы на запись'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_unknown_fields(self, client):
+        response = client.get('/api/v1/titles/?fields=id,secret&omit=nope')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестные поля в ?fields= и ?omit= '
+            'возвращают 400'
+        )
+        assert set(response.json()) == {'fields', 'omit'}
+        assert 'secret' in response.json()['fields'][0]
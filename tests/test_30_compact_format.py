@@ -0,0 +1,91 @@
+import pytest
+from rest_framework.test import APIClient
+
+from reviews.generator import DataGenerator, Distribution
+from reviews.models import Title
+
+COMPACT = 'application/vnd.yamdb.compact+json'
+
+
+def expand(title, included):
+    """Восстанавливает обычное представление произведения"""
+    genres = {genre['slug']: genre for genre in included['genres']}
+    categories = {category['slug']: category
+                  for category in included['categories']}
+    return dict(title, genre=[genres[slug] for slug in title['genre']],
+                category=title['category'] and categories[title['category']])
+
+
+@pytest.fixture
+def titles(db):
+    DataGenerator(
+        users=5, titles=25, reviews_per_title=Distribution('0'),
+        comments_per_review=Distribution('0'), genres=5, categories=2,
+        chunk_size=500,
+    ).run()
+    Title.objects.create(name='Без категории', year=2000)
+
+
+class Test30CompactFormat:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('query', ('', '&pagination=cursor',
+                                       '&fields=id,genre,category'))
+    def test_01_list(self, titles, query):
+        client = APIClient()
+        default = client.get(f'/api/v1/titles/?page=2{query}')
+        response = client.get(f'/api/v1/titles/?page=2&format=compact{query}')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith(COMPACT)
+        data = response.json()
+        included = data.pop('included')
+        results = data.pop('results')
+        expected = default.json()
+        assert set(data) == set(expected) - {'results'}
+        assert data.get('count') == expected.get('count')
+        assert 'format=compact' in data['next'], (
+            'Проверьте, что ссылки на страницы сохраняют формат'
+        )
+        assert all(isinstance(slug, str) for title in results
+                   for slug in title['genre']), (
+            'Проверьте, что жанры в компактном формате заменяются на slug'
+        )
+        for section in ('genres', 'categories'):
+            slugs = [item['slug'] for item in included[section]]
+            assert len(slugs) == len(set(slugs)), (
+                f'Проверьте, что объекты в included.{section} не повторяются'
+            )
+        assert [expand(title, included) for title in results] == (
+            expected['results']
+        ), 'Проверьте, что компактный формат содержит те же данные'
+        assert len(response.content) < len(default.content)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_retrieve_and_accept(self, titles):
+        client = APIClient()
+        title = Title.objects.exclude(category=None).first()
+        default = client.get(f'/api/v1/titles/{title.id}/').json()
+        response = client.get(f'/api/v1/titles/{title.id}/',
+                              HTTP_ACCEPT=COMPACT)
+        assert response['Content-Type'].startswith(COMPACT), (
+            'Проверьте, что компактный формат выбирается по заголовку Accept'
+        )
+        data = response.json()
+        assert data['category'] == default['category']['slug']
+        assert expand(data, data.pop('included')) == default
+        assert response['ETag'] != client.get(
+            f'/api/v1/titles/{title.id}/'
+        )['ETag'], 'Проверьте, что у форматов разные ETag'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_errors_and_other_endpoints(self, titles):
+        client = APIClient()
+        response = client.get('/api/v1/titles/?format=compact&fields=nope')
+        assert response.status_code == 400
+        assert list(response.json()) == ['fields'], (
+            'Проверьте, что ошибки выводятся без изменений'
+        )
+        assert client.get('/api/v1/titles/?format=compact').status_code == 200
+        assert client.get('/api/v1/genres/?format=compact').status_code == 404
+        response = client.get('/api/v1/titles/facets/?format=compact')
+        assert response.status_code == 404
@@ -0,0 +1,105 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.generator import DataGenerator, Distribution
+from reviews.models import Review, Title
+
+from .common import auth_client, create_comments
+
+
+class Test31TitleExpand:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_expand(self, client, admin_client, admin):
+        _, reviews, titles, user, _ = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        plain = client.get(url).json()
+        assert 'reviews' not in plain
+
+        data = client.get(url + '?expand=reviews').json()
+        expected_reviews = client.get(url + 'reviews/').json()['results']
+        assert data.pop('reviews') == expected_reviews, (
+            'Проверьте, что ?expand=reviews встраивает отзывы в формате '
+            'списка отзывов'
+        )
+        assert data == plain
+
+        data = client.get(
+            url + '?expand=reviews.comments&reviews_limit=2&comments_limit=2'
+        ).json()
+        assert [review['id'] for review in data['reviews']] == [
+            review['id'] for review in expected_reviews[:2]
+        ]
+        comments_url = f'{url}reviews/{reviews[0]["id"]}/comments/'
+        expected_comments = client.get(comments_url).json()['results']
+        embedded = {review['id']: review['comments']
+                    for review in data['reviews']}
+        assert embedded[reviews[2]['id']] == [], (
+            'Проверьте, что у отзыва без комментариев пустой список'
+        )
+        assert auth_client(user).post(
+            f'{url}reviews/{reviews[1]["id"]}/comments/', data={'text': 'x'}
+        ).status_code == 201
+        data = client.get(
+            url + '?expand=reviews.comments&reviews_limit=3&comments_limit=2'
+        ).json()
+        embedded = {review['id']: review['comments']
+                    for review in data['reviews']}
+        assert embedded[reviews[0]['id']] == expected_comments[:2], (
+            'Проверьте, что к отзыву встраиваются последние comments_limit '
+            'комментариев'
+        )
+        assert [comment['text'] for comment in embedded[reviews[1]['id']]] == [
+            'x'
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_bounded_queries(self):
+        DataGenerator(
+            users=20, titles=2, reviews_per_title=Distribution('15'),
+            comments_per_review=Distribution('uniform:0:8'), genres=3,
+            categories=2, chunk_size=500,
+        ).run()
+        title = Title.objects.first()
+        client = APIClient()
+        counts = []
+        for reviews_limit, comments_limit in ((1, 1), (15, 20)):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(
+                    f'/api/v1/titles/{title.id}/?expand=reviews.comments'
+                    f'&reviews_limit={reviews_limit}'
+                    f'&comments_limit={comments_limit}'
+                )
+                counts.append(len(queries))
+            assert response.status_code == 200
+        assert len(response.json()['reviews']) == 15
+        assert all(
+            len(review['comments'])
+            == Review.objects.get(id=review['id']).comments.count()
+            for review in response.json()['reviews']
+        )
+        assert counts[0] == counts[1], (
+            'Проверьте, что число запросов не зависит от лимитов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_etag_and_errors(self, client, admin_client, admin):
+        _, reviews, titles, user, _ = create_comments(admin_client, admin)
+        url = (f'/api/v1/titles/{titles[0]["id"]}/'
+               '?expand=reviews.comments')
+        etag = client.get(url)['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        auth_client(user).post(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}'
+            '/comments/', data={'text': 'Новый'}
+        )
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200, (
+            'Проверьте, что новый комментарий меняет ETag произведения '
+            'со встроенными комментариями'
+        )
+        for query in ('expand=ratings', 'expand=reviews&reviews_limit=0',
+                      'expand=reviews&comments_limit=1000'):
+            response = client.get(f'/api/v1/titles/{titles[0]["id"]}/?{query}')
+            assert response.status_code == 400, query
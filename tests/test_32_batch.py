@@ -0,0 +1,128 @@
+import json
+import threading
+
+import pytest
+
+from .common import create_titles
+
+URL = '/api/v1/batch/'
+
+
+def post_batch(client, requests):
+    return client.post(URL, data=json.dumps(requests),
+                       content_type='application/json')
+
+
+class Test32Batch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_batch(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        expected = admin_client.get('/api/v1/titles/?ordering=name').json()
+        response = post_batch(admin_client, [
+            {'method': 'GET', 'path': '/api/v1/titles/?ordering=name'},
+            {'method': 'GET', 'path': '/api/v1/genres/'},
+            {'method': 'POST', 'path': '/api/v1/genres/',
+             'body': {'name': 'Новый', 'slug': 'new'}},
+            {'method': 'GET', 'path': '/api/v1/genres/?search=Новый'},
+            {'method': 'PATCH', 'path': title_url, 'body': {'year': 1999}},
+            {'method': 'GET', 'path': title_url + '?fields=year'},
+            {'method': 'GET', 'path': '/api/v1/nothing/'},
+            {'method': 'DELETE', 'path': '/api/v1/genres/missing/'},
+        ])
+        assert response.status_code == 200
+        results = response.json()
+        assert [result['status'] for result in results] == [
+            200, 200, 201, 200, 200, 200, 404, 404
+        ], 'Проверьте статусы вложенных запросов'
+        assert results[0]['body'] == expected, (
+            'Проверьте, что тело совпадает с ответом обычного запроса'
+        )
+        assert results[0]['headers']['ETag']
+        assert results[1]['body']['count'] == 3
+        assert results[3]['body']['results'] == [{'name': 'Новый',
+                                                  'slug': 'new'}], (
+            'Проверьте, что запросы после изменения видят его результат'
+        )
+        assert results[5]['body'] == {'year': 1999}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_auth_once(self, admin_client, client, monkeypatch):
+        from api.authentication import StatelessJWTAuthentication
+        calls = []
+        authenticate = StatelessJWTAuthentication.authenticate
+
+        def counted(self, request):
+            calls.append(request)
+            return authenticate(self, request)
+
+        monkeypatch.setattr(StatelessJWTAuthentication, 'authenticate',
+                            counted)
+        requests = [{'method': 'GET', 'path': '/api/v1/users/'}] * 5
+        results = post_batch(admin_client, requests).json()
+        assert [result['status'] for result in results] == [200] * 5
+        assert len(calls) == 1, (
+            'Проверьте, что токен проверяется один раз на весь пакет'
+        )
+        results = post_batch(client, requests[:1] + [
+            {'method': 'POST', 'path': '/api/v1/genres/',
+             'body': {'name': 'Жанр', 'slug': 'genre'}}
+        ]).json()
+        assert [result['status'] for result in results] == [401, 401], (
+            'Проверьте, что права проверяются для каждого вложенного запроса'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_parallel_gets(self, admin_client, settings, monkeypatch):
+        import api.batch
+        settings.BATCH_WORKERS = 4
+        threads = []
+        dispatch = api.batch.dispatch
+
+        def recorded(request):
+            threads.append((request.method, threading.current_thread()))
+            return dispatch(request)
+
+        monkeypatch.setattr(api.batch, 'dispatch', recorded)
+        results = post_batch(admin_client, [
+            {'method': 'GET', 'path': '/api/v1/genres/'},
+            {'method': 'GET', 'path': '/api/v1/categories/'},
+            {'method': 'POST', 'path': '/api/v1/genres/',
+             'body': {'name': 'Жанр', 'slug': 'genre'}},
+        ]).json()
+        assert [result['status'] for result in results] == [200, 200, 201]
+        main = threading.current_thread()
+        assert all(thread is not main for method, thread in threads
+                   if method == 'GET'), (
+            'Проверьте, что GET-запросы выполняются в пуле потоков'
+        )
+        assert [thread for method, thread in threads
+                if method == 'POST'] == [main]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_limits(self, admin_client, settings):
+        settings.BATCH_MAX_REQUESTS = 3
+        settings.BATCH_MAX_COST = 6
+        get = {'method': 'GET', 'path': '/api/v1/genres/'}
+        post = {'method': 'POST', 'path': '/api/v1/genres/', 'body': {}}
+        invalid = (
+            [get] * 4,
+            [post, post],
+            [{'method': 'TRACE', 'path': '/api/v1/genres/'}],
+            [{'method': 'GET', 'path': '/admin/'}],
+            [{'method': 'POST', 'path': URL, 'body': []}],
+            {'method': 'GET', 'path': '/api/v1/genres/'},
+        )
+        for requests in invalid:
+            response = post_batch(admin_client, requests)
+            assert response.status_code == 400, (
+                f'Проверьте, что пакет {requests} отклоняется'
+            )
+        assert post_batch(admin_client, [get, post]).status_code == 200
+        result, = post_batch(admin_client, [
+            {'method': 'GET', 'path': '/api/v1/export/titles/'}
+        ]).json()
+        assert result['status'] == 400, (
+            'Проверьте, что потоковые ответы в пакете не выполняются'
+        )